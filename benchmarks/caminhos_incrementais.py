@@ -0,0 +1,139 @@
+"""Confere e mede a atualização incremental dos caminhos mínimos (Grafo.alterar_custo/remover_ligacao).
+
+Uso:
+    python benchmarks/caminhos_incrementais.py [--vertices 50 200] [--alteracoes 30] [--semente 0]
+
+Em cada instância sintética (a mesma de benchmarks/micro.py), aplica alterações sorteadas de
+custo (aumentos, reduções e remoções, em arestas e arcos) e, depois de cada uma, compara as
+matrizes atualizadas no lugar com um recálculo completo de caminhos_minimos(): distâncias
+iguais e predecessores que formam caminhos com o custo indicado. Também confere casos fixos,
+como um arco paralelo a uma aresta, em que só um dos sentidos muda. Termina com código 1 se
+alguma atualização divergir.
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'etapa1', 'src'))
+
+from grafo import Grafo
+from micro import carregar
+
+
+def recalcular(grafo):
+    """Caminhos mínimos do zero para o conteúdo atual do grafo."""
+    copia = Grafo()
+    copia.vertices = set(grafo.vertices)
+    copia.arestas, copia.arcos = list(grafo.arestas), list(grafo.arcos)
+    copia.arestas_requeridas, copia.arcos_requeridos = list(grafo.arestas_requeridas), list(grafo.arcos_requeridos)
+    return copia.caminhos_minimos()
+
+
+def divergencias(grafo):
+    """Lista de problemas entre as matrizes atualizadas e um recálculo completo."""
+    verts, dist, pred = grafo.caminhos_minimos()
+    _, referencia, _ = recalcular(grafo)
+    problemas = []
+    if not np.array_equal(np.isinf(dist), np.isinf(referencia)) or \
+            not np.allclose(np.where(np.isinf(dist), 0, dist), np.where(np.isinf(referencia), 0, referencia)):
+        diferentes = np.argwhere(~np.isclose(dist, referencia) & ~(np.isinf(dist) & np.isinf(referencia)))
+        i, j = diferentes[0]
+        problemas.append(f"dist[{verts[i]}→{verts[j]}] = {dist[i, j]}, recálculo = {referencia[i, j]}")
+    n = len(verts)
+    for i in range(n):
+        for j in range(n):
+            p = pred[i, j]
+            if i == j or p < 0:
+                if (p < 0) != (i == j or math.isinf(dist[i, j])):
+                    problemas.append(f"pred[{verts[i]}→{verts[j]}] ausente com distância finita")
+                continue
+            if not math.isclose(dist[i, p] + grafo._peso_direto(p, j), dist[i, j], abs_tol=1e-9):
+                problemas.append(f"pred[{verts[i]}→{verts[j]}] = {verts[p]} não forma um caminho mínimo")
+    if grafo._caminhos_listas is not None and not np.allclose(np.array(grafo._caminhos_listas[0]), dist):
+        problemas.append("listas de floyd_warshall() desatualizadas")
+    return problemas[:5]
+
+
+def casos_fixos():
+    """(descrição, grafo, alteração) com situações que já quebraram a atualização."""
+    casos = []
+    # Arco 1→2 paralelo à aresta 1–2: ao encarecer a aresta, só o sentido 2→1 piora
+    g = Grafo()
+    g.vertices = {1, 2, 3, 4}
+    g.arestas = [(1, 2, 5.0), (2, 3, 1.0), (3, 4, 1.0)]
+    g.arcos = [(1, 2, 3.0), (4, 1, 100.0)]
+    casos.append(("aumento com arco paralelo", g, lambda g: g.alterar_custo(1, 2, 10)))
+    g = Grafo()
+    g.vertices = {1, 2, 3, 4}
+    g.arestas = [(1, 2, 5.0), (2, 3, 1.0), (3, 4, 1.0)]
+    g.arcos = [(1, 2, 3.0), (4, 1, 100.0)]
+    casos.append(("remoção com arco paralelo", g, lambda g: g.remover_ligacao(1, 2)))
+    g = Grafo()
+    g.vertices = {1, 2, 3, 4}
+    g.arestas = [(1, 2, 5.0), (2, 3, 1.0), (3, 4, 1.0)]
+    g.arcos = [(2, 1, 3.0), (4, 1, 100.0)]
+    casos.append(("redução com arco paralelo", g, lambda g: g.alterar_custo(1, 2, 1)))
+    return casos
+
+
+def alterar_aleatorio(grafo, aleatorio):
+    """Aplica uma alteração sorteada; retorna a sua descrição."""
+    arco = aleatorio.random() < 0.5 and bool(grafo.arcos or grafo.arcos_requeridos)
+    ligacoes = grafo.arcos + grafo.arcos_requeridos if arco else grafo.arestas + grafo.arestas_requeridas
+    u, v, custo = aleatorio.choice(ligacoes)[:3]
+    removivel = (u, v, custo) in (grafo.arcos if arco else grafo.arestas)
+    if removivel and aleatorio.random() < 0.3:
+        grafo.remover_ligacao(u, v, arco)
+        return f"remover {'arco' if arco else 'aresta'} ({u}, {v})"
+    novo = max(0, custo + aleatorio.choice((-5, -2, 3, 10, 50)))
+    grafo.alterar_custo(u, v, novo, arco)
+    return f"{'arco' if arco else 'aresta'} ({u}, {v}): {custo} -> {novo}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere a atualização incremental dos caminhos mínimos.")
+    parser.add_argument("--vertices", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--alteracoes", type=int, default=30, help="alterações sorteadas por instância")
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+
+    falhas = 0
+    for descricao, g, alterar in casos_fixos():
+        g.floyd_warshall()
+        alterar(g)
+        problemas = divergencias(g)
+        falhas += bool(problemas)
+        print(f"{descricao:<32} {'ok' if not problemas else 'DIVERGE: ' + '; '.join(problemas)}")
+
+    aleatorio = random.Random(args.semente)
+    for vertices in args.vertices:
+        g = carregar(vertices, vertices, args.semente)
+        g.floyd_warshall()
+        incremental = completo = 0.0
+        for _ in range(args.alteracoes):
+            inicio = time.perf_counter()
+            descricao = alterar_aleatorio(g, aleatorio)
+            incremental += time.perf_counter() - inicio
+            inicio = time.perf_counter()
+            problemas = divergencias(g)
+            completo += time.perf_counter() - inicio
+            if problemas:
+                falhas += 1
+                print(f"{vertices} vértices, {descricao}: DIVERGE: {'; '.join(problemas)}")
+        print(f"{vertices} vértices: {args.alteracoes} alterações, incremental {incremental / args.alteracoes * 1e3:.2f} ms "
+              f"por alteração (recálculo + conferência {completo / args.alteracoes * 1e3:.2f} ms)")
+
+    if falhas:
+        print(f"{falhas} divergências")
+        sys.exit(1)
+    print("Sem divergências.")
+
+
+if __name__ == "__main__":
+    main()
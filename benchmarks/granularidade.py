@@ -0,0 +1,74 @@
+"""Compara qualidade e tempo da busca local da etapa 3 para diferentes granularidades.
+
+Uso:
+    python benchmarks/granularidade.py [pasta_dados] [--padrao DI-NEARP-*.dat] [--k 5 10 20]
+
+Para cada instância roda a busca local com a vizinhança completa e com cada K pedido,
+e mostra custo, tempo e a diferença em relação à vizinhança completa.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'etapa1', 'src'))
+sys.path.insert(0, os.path.join(RAIZ, 'etapa3'))
+
+from grafo import Grafo
+from solucao_etapa3 import SolucaoMelhorada
+
+
+def executar(arquivo, granularidade):
+    g = Grafo()
+    g.ler_dat(arquivo)
+    capacidade = g.capacidade if g.capacidade is not None else 5
+    # Caminhos mínimos fora da medição: o interesse aqui é só a busca local
+    g.caminhos_minimos()
+    inicio = time.perf_counter()
+    solucao = SolucaoMelhorada(g, capacidade, granularidade=granularidade)
+    solucao.resolver()
+    return solucao.custo_total, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trade-off qualidade/tempo da vizinhança granular.")
+    parser.add_argument("pasta_dados", nargs="?", default=os.path.join(RAIZ, 'etapa3', 'dados', 'MCGRP'))
+    parser.add_argument("--padrao", default="DI-NEARP-*.dat", help="instâncias a considerar")
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10, 20], help="granularidades a comparar")
+    args = parser.parse_args()
+
+    arquivos = sorted(glob.glob(os.path.join(args.pasta_dados, args.padrao)))
+    if not arquivos:
+        print(f"Nenhuma instância {args.padrao} em {args.pasta_dados}")
+        sys.exit(1)
+
+    configuracoes = [None] + args.k
+    totais = {k: [0.0, 0.0] for k in configuracoes}  # custo, tempo
+
+    print(f"{'instância':<28} {'k':>5} {'custo':>12} {'tempo (s)':>10} {'dif. custo':>11}")
+    for arquivo in arquivos:
+        nome = os.path.basename(arquivo)
+        custo_completo = None
+        for k in configuracoes:
+            custo, tempo = executar(arquivo, k)
+            totais[k][0] += custo
+            totais[k][1] += tempo
+            if k is None:
+                custo_completo = custo
+            diferenca = (custo - custo_completo) / custo_completo * 100 if custo_completo else 0.0
+            print(f"{nome:<28} {k if k else 'todos':>5} {custo:>12.2f} {tempo:>10.3f} {diferenca:>10.2f}%")
+
+    print("\nResumo (soma sobre as instâncias):")
+    custo_base, tempo_base = totais[None]
+    for k in configuracoes:
+        custo, tempo = totais[k]
+        diferenca = (custo - custo_base) / custo_base * 100 if custo_base else 0.0
+        aceleracao = tempo_base / tempo if tempo > 0 else float('inf')
+        print(f"  k={k if k else 'todos':>5}: custo {custo:.2f} ({diferenca:+.2f}%), "
+              f"tempo {tempo:.2f}s ({aceleracao:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Microbenchmarks dos núcleos que dominam o tempo: caminhos mínimos, custos e operadores.
+
+Uso:
+    python benchmarks/micro.py [--vertices 50 100 200 400] [--servicos 50 200]
+                               [--csv curvas.csv] [--gravar-base micro.json] [--base micro.json]
+
+Para cada combinação de número de vértices e de serviços, gera uma instância sintética
+(mesmo formato .dat das instâncias MCGRP, lida pelo próprio Grafo) e mede com timeit:
+
+- Grafo.floyd_warshall (caminhos mínimos recalculados do zero, incluindo a conversão para listas)
+- SolucaoMelhorada._calcular_caminho (reconstrução de um caminho, média sobre pares sorteados)
+- SolucaoMelhorada._calcular_custo_rota (todas as rotas da solução)
+- cada operador da busca local, em uma varredura completa de todas as rotas (intra-rota)
+  ou de todos os pares de rotas (entre rotas)
+
+Os operadores são medidos em um ótimo local, então nenhuma varredura altera a solução e
+todas percorrem a vizinhança inteira. O tempo de cada núcleo é o menor entre as repetições.
+O CSV tem uma linha por (núcleo, vértices, serviços), pronto para curvas de escala; com
+--base, o script termina com código 1 se algum núcleo ficar mais lento que --tolerancia.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'etapa1', 'src'))
+sys.path.insert(0, os.path.join(RAIZ, 'etapa3'))
+
+from grafo import Grafo
+from solucao_etapa3 import SolucaoMelhorada
+
+OPERADORES_INTRA = ('_aplicar_2opt_intra_rota', '_aplicar_orientacao_rota',
+                    '_aplicar_realocacao_intra_rota', '_aplicar_oropt_intra_rota')
+OPERADORES_ENTRE = ('_aplicar_troca_entre_rotas', '_aplicar_realocacao_entre_rotas',
+                    '_aplicar_cross_entre_rotas')
+
+# Serviços por rota, em média, na instância sintética
+SERVICOS_POR_ROTA = 10
+
+
+def gerar_instancia(vertices, servicos, semente=0):
+    """Texto .dat de uma instância conexa com `vertices` vértices e `servicos` serviços.
+
+    Um ciclo de arestas garante a conexidade; cerca de 2 ligações extras por vértice
+    (metade arestas, metade arcos) completam o grafo. Os serviços são divididos entre
+    vértices, arestas e arcos requeridos.
+    """
+    aleatorio = random.Random(semente)
+    arestas = [(v, v % vertices + 1) for v in range(1, vertices + 1)]
+    arcos = []
+    for _ in range(2 * vertices):
+        u, v = aleatorio.sample(range(1, vertices + 1), 2)
+        (arestas if aleatorio.random() < 0.5 else arcos).append((u, v))
+
+    nos = aleatorio.sample(range(1, vertices + 1), min(servicos // 3, vertices))
+    aleatorio.shuffle(arestas)
+    aleatorio.shuffle(arcos)
+    restantes = servicos - len(nos)
+    qtd_arestas = min(restantes // 2, len(arestas))
+    qtd_arcos = min(restantes - qtd_arestas, len(arcos))
+
+    def custo():
+        return aleatorio.randint(1, 20)
+
+    def demanda():
+        return aleatorio.randint(1, 10)
+
+    linhas = [f"Name:\t\tsintetica_{vertices}_{servicos}", "Optimal value:\t-1", "#Vehicles:\t-1",
+              f"Capacity:\t{SERVICOS_POR_ROTA * 6}", "Depot Node:\t1", f"#Nodes:\t\t{vertices}",
+              f"#Edges:\t\t{len(arestas)}", f"#Arcs:\t\t{len(arcos)}", f"#Required N:\t{len(nos)}",
+              f"#Required E:\t{qtd_arestas}", f"#Required A:\t{qtd_arcos}", "", "ReN.\tDEMAND\tS. COST"]
+    linhas += [f"N{v}\t{demanda()}\t{custo()}" for v in nos]
+    linhas += ["", "ReE.\tFrom N.\tTo N.\tT. COST\tDEMAND\tS. COST"]
+    linhas += [f"E{k}\t{u}\t{v}\t{custo()}\t{demanda()}\t{custo()}"
+               for k, (u, v) in enumerate(arestas[:qtd_arestas], 1)]
+    linhas += ["", "EDGE\tFROM N.\tTO N.\tT. COST"]
+    linhas += [f"NrE{k}\t{u}\t{v}\t{custo()}" for k, (u, v) in enumerate(arestas[qtd_arestas:], 1)]
+    linhas += ["", "ReA.\tFROM N.\tTO N.\tT. COST\tDEMAND\tS. COST"]
+    linhas += [f"A{k}\t{u}\t{v}\t{custo()}\t{demanda()}\t{custo()}"
+               for k, (u, v) in enumerate(arcos[:qtd_arcos], 1)]
+    linhas += ["", "ARC\tFROM N.\tTO N.\tT. COST"]
+    linhas += [f"NrA{k}\t{u}\t{v}\t{custo()}" for k, (u, v) in enumerate(arcos[qtd_arcos:], 1)]
+    return "\n".join(linhas) + "\n"
+
+
+def carregar(vertices, servicos, semente):
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo = os.path.join(pasta, "sintetica.dat")
+        with open(arquivo, 'w') as f:
+            f.write(gerar_instancia(vertices, servicos, semente))
+        g = Grafo()
+        g.ler_dat(arquivo)
+    return g
+
+
+def ate_otimo_local(solucao):
+    """Aplica os operadores até nenhum melhorar, para que as medições não alterem a solução."""
+    melhorou = True
+    while melhorou:
+        melhorou = False
+        for nome in OPERADORES_INTRA:
+            for rota in solucao.rotas:
+                melhorou |= getattr(solucao, nome)(rota)
+        for nome in OPERADORES_ENTRE:
+            for rota1 in solucao.rotas:
+                for rota2 in solucao.rotas:
+                    if rota1 is not rota2:
+                        melhorou |= getattr(solucao, nome)(rota1, rota2)
+    solucao._recalcular_custo_total()
+
+
+def medir(funcao, repeticoes):
+    """Menor tempo por chamada (segundos) entre `repeticoes` rodadas calibradas pelo timeit."""
+    temporizador = timeit.Timer(funcao)
+    chamadas, _ = temporizador.autorange()
+    return min(temporizador.repeat(repeticoes, chamadas)) / chamadas
+
+
+def medir_instancia(vertices, servicos, repeticoes, semente):
+    """Retorna {núcleo: segundos por chamada} para uma instância sintética."""
+    g = carregar(vertices, servicos, semente)
+    tempos = {}
+
+    def floyd_warshall():
+        g.invalidar_caminhos()
+        g.floyd_warshall()
+    tempos['floyd_warshall'] = medir(floyd_warshall, repeticoes)
+
+    solucao = SolucaoMelhorada(g, g.capacidade)
+    solucao.resolver()
+    ate_otimo_local(solucao)
+
+    aleatorio = random.Random(semente)
+    verts = solucao.verts
+    pares = [(aleatorio.choice(verts), aleatorio.choice(verts)) for _ in range(100)]
+
+    def calcular_caminhos():
+        for origem, destino in pares:
+            solucao._calcular_caminho(origem, destino)
+    tempos['_calcular_caminho'] = medir(calcular_caminhos, repeticoes) / len(pares)
+
+    def calcular_custos():
+        for rota in solucao.rotas:
+            solucao._calcular_custo_rota(rota)
+    tempos['_calcular_custo_rota'] = medir(calcular_custos, repeticoes)
+
+    rotas = solucao.rotas
+    pares_rotas = [(rota1, rota2) for rota1 in rotas for rota2 in rotas if rota1 is not rota2]
+    custo = solucao.custo_total
+    for nome in OPERADORES_INTRA:
+        operador = getattr(solucao, nome)
+        tempos[nome] = medir(lambda: [operador(rota) for rota in rotas], repeticoes)
+    for nome in OPERADORES_ENTRE:
+        operador = getattr(solucao, nome)
+        tempos[nome] = medir(lambda: [operador(rota1, rota2) for rota1, rota2 in pares_rotas], repeticoes)
+    solucao._recalcular_custo_total()
+    assert solucao.custo_total == custo, "Um operador alterou a solução durante a medição"
+    return tempos, len(rotas)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks dos núcleos do resolvedor em instâncias sintéticas.")
+    parser.add_argument("--vertices", type=int, nargs="+", default=[50, 100, 200, 400])
+    parser.add_argument("--servicos", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--repeticoes", type=int, default=5, help="rodadas do timeit por núcleo")
+    parser.add_argument("--semente", type=int, default=0, help="semente das instâncias sintéticas")
+    parser.add_argument("--csv", metavar="ARQUIVO", default=None, help="grava as curvas de escala em CSV")
+    parser.add_argument("--gravar-base", metavar="ARQUIVO", default=None, help="grava os tempos como base")
+    parser.add_argument("--base", metavar="ARQUIVO", default=None, help="compara com uma base gravada antes")
+    parser.add_argument("--tolerancia", type=float, default=25.0, metavar="PCT",
+                        help="aumento de tempo aceito por núcleo, em %% (padrão: 25)")
+    args = parser.parse_args()
+
+    linhas = []
+    for vertices in args.vertices:
+        for servicos in args.servicos:
+            tempos, rotas = medir_instancia(vertices, servicos, args.repeticoes, args.semente)
+            print(f"\n{vertices} vértices, {servicos} serviços, {rotas} rotas")
+            for nucleo, tempo in tempos.items():
+                print(f"  {nucleo:<32} {tempo * 1e6:>12.1f} µs")
+                linhas.append({'nucleo': nucleo, 'vertices': vertices, 'servicos': servicos,
+                               'rotas': rotas, 'segundos': tempo})
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            escritor = csv.DictWriter(f, ('nucleo', 'vertices', 'servicos', 'rotas', 'segundos'))
+            escritor.writeheader()
+            escritor.writerows(linhas)
+        print(f"\nCurvas gravadas em {args.csv}")
+
+    if args.gravar_base:
+        with open(args.gravar_base, 'w') as f:
+            json.dump(linhas, f, indent=1)
+        print(f"Base gravada em {args.gravar_base}")
+
+    if args.base:
+        with open(args.base) as f:
+            anteriores = {(l['nucleo'], l['vertices'], l['servicos']): l['segundos'] for l in json.load(f)}
+        regressoes = []
+        print(f"\nComparação com {args.base}:")
+        for linha in linhas:
+            anterior = anteriores.get((linha['nucleo'], linha['vertices'], linha['servicos']))
+            if anterior is None:
+                continue
+            variacao = (linha['segundos'] - anterior) / anterior * 100 if anterior > 0 else 0.0
+            if variacao > args.tolerancia:
+                regressoes.append(f"{linha['nucleo']} ({linha['vertices']} vértices, {linha['servicos']} serviços): "
+                                  f"{anterior * 1e6:.1f} -> {linha['segundos'] * 1e6:.1f} µs ({variacao:+.1f}%)")
+        if regressoes:
+            print(f"{len(regressoes)} regressões:")
+            for regressao in regressoes:
+                print(f"  {regressao}")
+            sys.exit(1)
+        print("Sem regressões.")
+
+
+if __name__ == "__main__":
+    main()
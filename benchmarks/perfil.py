@@ -0,0 +1,95 @@
+"""Agrega os perfis gravados pela etapa 3 com --instrumentar para achar os pontos quentes.
+
+Uso:
+    (cd etapa3 && python solucao_etapa3.py dados/MCGRP --instrumentar)
+    python benchmarks/perfil.py [pasta_perfis] [--csv resumo.csv] [--top 10]
+
+A etapa 3 acha etapa1/src e grava em G3Result relativos à pasta corrente, por isso roda de
+dentro de etapa3; sem pasta_perfis, lê etapa3/G3Result.
+
+Soma, sobre todas as instâncias, o tempo de cada etapa e, para cada operador, chamadas,
+varreduras puladas, movimentos avaliados, melhorias (também por movimento avaliado) e tempo; lista também as instâncias
+em que a busca local gastou mais tempo.
+"""
+import argparse
+import csv
+import glob
+import json
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CAMPOS_OPERADOR = ('chamadas', 'puladas', 'movimentos_avaliados', 'melhorias', 'tempo')
+
+
+def carregar(pasta):
+    perfis = []
+    for arquivo in sorted(glob.glob(os.path.join(pasta, "perfil-*.json"))):
+        with open(arquivo) as f:
+            perfis.append(json.load(f))
+    return perfis
+
+
+def agregar(perfis):
+    """Retorna (etapas, operadores) somados sobre os perfis."""
+    etapas = {}
+    operadores = {}
+    for perfil in perfis:
+        for nome, tempo in perfil['etapas'].items():
+            etapas[nome] = etapas.get(nome, 0.0) + tempo
+        for nome, contagem in perfil['operadores'].items():
+            total = operadores.setdefault(nome, dict.fromkeys(CAMPOS_OPERADOR, 0))
+            for campo in CAMPOS_OPERADOR:
+                total[campo] += contagem[campo]
+    return etapas, operadores
+
+
+def tempo_busca(perfil):
+    return sum(tempo for nome, tempo in perfil['etapas'].items() if nome.startswith('busca'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumo dos perfis da etapa 3 sobre todas as instâncias.")
+    parser.add_argument("pasta_perfis", nargs="?", default=os.path.join(RAIZ, 'etapa3', 'G3Result'))
+    parser.add_argument("--csv", metavar="ARQUIVO", default=None, help="grava a tabela por operador em CSV")
+    parser.add_argument("--top", type=int, default=10, help="quantas instâncias mais lentas listar")
+    args = parser.parse_args()
+
+    perfis = carregar(args.pasta_perfis)
+    if not perfis:
+        print(f"Nenhum perfil-*.json em {args.pasta_perfis}")
+        sys.exit(1)
+    etapas, operadores = agregar(perfis)
+
+    total_etapas = sum(etapas.values())
+    print(f"{len(perfis)} instâncias\n")
+    print(f"{'etapa':<20} {'tempo (s)':>10} {'%':>7}")
+    for nome, tempo in sorted(etapas.items(), key=lambda item: -item[1]):
+        print(f"{nome:<20} {tempo:>10.3f} {tempo / total_etapas * 100 if total_etapas else 0.0:>6.1f}%")
+
+    print(f"\n{'operador':<24} {'chamadas':>9} {'puladas':>9} {'avaliados':>12} {'melhorias':>9} "
+          f"{'aceitação':>9} {'tempo (s)':>10} {'ns/mov.':>8}")
+    linhas = []
+    for nome, total in sorted(operadores.items(), key=lambda item: -item[1]['tempo']):
+        aceitacao = total['melhorias'] / total['movimentos_avaliados'] if total['movimentos_avaliados'] else 0.0
+        por_movimento = total['tempo'] / total['movimentos_avaliados'] * 1e9 if total['movimentos_avaliados'] else 0.0
+        print(f"{nome:<24} {total['chamadas']:>9} {total['puladas']:>9} {total['movimentos_avaliados']:>12} "
+              f"{total['melhorias']:>9} {aceitacao:>8.3%} {total['tempo']:>10.3f} {por_movimento:>8.0f}")
+        linhas.append([nome] + [total[campo] for campo in CAMPOS_OPERADOR] + [aceitacao, por_movimento])
+
+    print("\nInstâncias com mais tempo de busca:")
+    for perfil in sorted(perfis, key=tempo_busca, reverse=True)[:args.top]:
+        print(f"  {perfil.get('instancia', '?'):<28} {tempo_busca(perfil):>8.3f}s "
+              f"{perfil.get('movimentos_avaliados', 0):>12} movimentos")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(('operador',) + CAMPOS_OPERADOR + ('taxa_aceitacao', 'ns_por_movimento'))
+            escritor.writerows(linhas)
+        print(f"\nTabela por operador gravada em {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Bateria de desempenho sobre as instâncias MCGRP, com comparação contra uma base gravada.
+
+Uso:
+    python benchmarks/suite.py [--camadas BHW CBMix ...] [--configuracoes busca_local split ...]
+                               [--por-camada N] [--csv resultados.csv]
+                               [--gravar-base base.json] [--base base.json]
+
+Cada par (configuração, instância) roda em um processo Python próprio, que mede o tempo
+de leitura, dos caminhos mínimos e do resolvedor, o pico de memória residente do processo
+e o gap do custo em relação a dados/reference_values.csv. Com --gravar-base os resultados
+viram a base; com --base eles são comparados a uma base anterior e o script termina com
+código 1 se o custo de alguma instância piorar além de --tolerancia-custo, ou se o tempo
+total de alguma camada crescer além de --tolerancia-tempo (e de --folga-tempo segundos).
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Fora de sistemas Unix o pico de memória não é medido
+    resource = None
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DADOS = os.path.join(RAIZ, 'etapa3', 'dados')
+
+# Camadas de instâncias, identificadas pelo prefixo do nome do arquivo
+CAMADAS = ('BHW', 'CBMix', 'mggdb', 'mgval', 'DI-NEARP')
+
+# Configurações: (etapa, opções do Grafo, opções do construtor de SolucaoMelhorada, opções de resolver())
+CONFIGURACOES = {
+    'construtivo': ('etapa2', {}, {}, {}),
+    'busca_local': ('etapa3', {}, {}, {}),
+    'split': ('etapa3', {}, {'construtor': 'split'}, {}),
+    'granular': ('etapa3', {}, {'granularidade': 10}, {}),
+    'primeira': ('etapa3', {}, {'estrategia': 'primeira'}, {}),
+    'iterada': ('etapa3', {}, {}, {'max_iteracoes': 50}),
+    'reduzida': ('etapa3', {}, {'matriz_reduzida': True}, {}),
+    'pouca_memoria': ('etapa3', {'pouca_memoria': True}, {}, {}),
+}
+
+
+def camada(nome):
+    for prefixo in CAMADAS:
+        if nome.startswith(prefixo):
+            return prefixo
+    return 'outras'
+
+
+def ler_referencias(caminho):
+    """Nome da instância -> melhor custo conhecido."""
+    referencias = {}
+    with open(caminho) as f:
+        leitor = csv.reader(f, skipinitialspace=True)
+        next(leitor)
+        for linha in leitor:
+            if linha:
+                referencias[linha[0]] = float(linha[1])
+    return referencias
+
+
+def selecionar(pasta, camadas, por_camada):
+    """Instâncias das camadas pedidas; com por_camada, até N espalhadas por tamanho em cada uma."""
+    arquivos = sorted(os.path.join(pasta, nome) for nome in os.listdir(pasta) if nome.endswith('.dat'))
+    selecionados = []
+    for nome_camada in camadas:
+        da_camada = sorted((arquivo for arquivo in arquivos if camada(os.path.basename(arquivo)) == nome_camada),
+                           key=os.path.getsize)
+        if por_camada is not None and len(da_camada) > por_camada:
+            passo = (len(da_camada) - 1) / max(por_camada - 1, 1)
+            da_camada = [da_camada[round(k * passo)] for k in range(por_camada)]
+        selecionados += da_camada
+    return selecionados
+
+
+def executar_uma(nome_configuracao, arquivo):
+    """Roda uma configuração em uma instância, dentro deste processo, e imprime a medição em JSON."""
+    sys.path.insert(0, os.path.join(RAIZ, 'etapa1', 'src'))
+    etapa, opcoes_grafo, opcoes, opcoes_resolver = CONFIGURACOES[nome_configuracao]
+    sys.path.insert(0, os.path.join(RAIZ, etapa))
+    from grafo import Grafo
+    from servicos import TabelaServicos
+
+    inicio = time.perf_counter()
+    g = Grafo(**opcoes_grafo)
+    g.ler_dat(arquivo)
+    lido = time.perf_counter()
+    if opcoes.get('matriz_reduzida'):
+        # Os mesmos vértices-chave do resolvedor (depósito e extremidades dos serviços), para
+        # que ele reaproveite a matriz do cache e o tempo fique todo em tempo_caminhos
+        chaves = TabelaServicos(g).extremidades() | {int(g.info.get('Depot Node', 1))}
+        g.caminhos_reduzidos(chaves)
+    else:
+        g.caminhos_minimos()
+    caminhos = time.perf_counter()
+    capacidade = g.capacidade if g.capacidade is not None else 5
+    if etapa == 'etapa2':
+        from solucao_etapa2 import SolucaoConstrutiva
+        solucao = SolucaoConstrutiva(g, capacidade)
+        solucao.construir_solucao()
+    else:
+        from solucao_etapa3 import SolucaoMelhorada
+        solucao = SolucaoMelhorada(g, capacidade, **opcoes)
+        solucao.resolver(**opcoes_resolver)
+    fim = time.perf_counter()
+
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None
+    print(json.dumps({
+        'custo': solucao.custo_total,
+        'rotas': len(solucao.rotas),
+        'tempo_leitura': lido - inicio,
+        'tempo_caminhos': caminhos - lido,
+        'tempo_solucao': fim - caminhos,
+        'tempo_total': fim - inicio,
+        'rss_pico_kb': pico,  # KB no Linux
+    }))
+
+
+def medir(nome_configuracao, arquivo, tempo_limite):
+    """Executa executar_uma em um processo novo; retorna o dicionário medido ou None em falha."""
+    comando = [sys.executable, os.path.abspath(__file__), '--executar', nome_configuracao, arquivo]
+    try:
+        processo = subprocess.run(comando, capture_output=True, text=True, timeout=tempo_limite)
+    except subprocess.TimeoutExpired:
+        print(f"  tempo limite excedido: {os.path.basename(arquivo)}")
+        return None
+    if processo.returncode != 0:
+        print(f"  falha em {os.path.basename(arquivo)}: {processo.stderr.strip().splitlines()[-1:]}")
+        return None
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def resumir(resultados):
+    """Totais por (configuração, camada), na ordem em que aparecem."""
+    resumo = {}
+    for r in resultados:
+        total = resumo.setdefault((r['configuracao'], r['camada']), {
+            'instancias': 0, 'tempo_total': 0.0, 'tempo_caminhos': 0.0, 'rss_pico_kb': 0,
+            'soma_gap': 0.0, 'com_gap': 0})
+        total['instancias'] += 1
+        total['tempo_total'] += r['tempo_total']
+        total['tempo_caminhos'] += r['tempo_caminhos']
+        total['rss_pico_kb'] = max(total['rss_pico_kb'], r['rss_pico_kb'] or 0)
+        if r['gap'] is not None:
+            total['soma_gap'] += r['gap']
+            total['com_gap'] += 1
+    return resumo
+
+
+def imprimir_resumo(resumo):
+    print(f"\n{'configuração':<14} {'camada':<10} {'inst.':>5} {'tempo (s)':>10} {'APSP (s)':>9} "
+          f"{'RSS máx (MB)':>12} {'gap médio':>10}")
+    for (nome_configuracao, nome_camada), total in resumo.items():
+        gap = total['soma_gap'] / total['com_gap'] if total['com_gap'] else float('nan')
+        print(f"{nome_configuracao:<14} {nome_camada:<10} {total['instancias']:>5} {total['tempo_total']:>10.2f} "
+              f"{total['tempo_caminhos']:>9.2f} {total['rss_pico_kb'] / 1024:>12.1f} {gap:>9.2f}%")
+
+
+def comparar(resultados, base, tolerancia_custo, tolerancia_tempo, folga_tempo):
+    """Lista as regressões em relação à base (custo por instância, tempo por camada)."""
+    anteriores = {(r['configuracao'], r['instancia']): r for r in base['resultados']}
+    regressoes = []
+    comuns = []
+    for r in resultados:
+        anterior = anteriores.get((r['configuracao'], r['instancia']))
+        if anterior is None:
+            continue
+        comuns.append((r, anterior))
+        limite = anterior['custo'] * (1 + tolerancia_custo / 100) + 1e-9
+        if r['custo'] > limite:
+            regressoes.append(f"custo {r['configuracao']}/{r['instancia']}: {anterior['custo']:.2f} -> {r['custo']:.2f}")
+
+    # Tempo somado por camada, só sobre as instâncias presentes nas duas execuções
+    tempos = {}
+    for r, anterior in comuns:
+        par = tempos.setdefault((r['configuracao'], r['camada']), [0.0, 0.0])
+        par[0] += anterior['tempo_total']
+        par[1] += r['tempo_total']
+    for (nome_configuracao, nome_camada), (antes, agora) in tempos.items():
+        variacao = (agora - antes) / antes * 100 if antes > 0 else 0.0
+        print(f"  {nome_configuracao:<14} {nome_camada:<10} tempo {antes:8.2f}s -> {agora:8.2f}s ({variacao:+.1f}%)")
+        if agora > antes * (1 + tolerancia_tempo / 100) and agora - antes > folga_tempo:
+            regressoes.append(f"tempo {nome_configuracao}/{nome_camada}: {antes:.2f}s -> {agora:.2f}s "
+                              f"({variacao:+.1f}%)")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bateria de desempenho e qualidade sobre as instâncias MCGRP.")
+    parser.add_argument("--pasta", default=os.path.join(DADOS, 'MCGRP'), help="pasta com as instâncias .dat")
+    parser.add_argument("--referencias", default=os.path.join(DADOS, 'reference_values.csv'))
+    parser.add_argument("--camadas", nargs="+", choices=CAMADAS, default=list(CAMADAS))
+    parser.add_argument("--configuracoes", nargs="+", choices=list(CONFIGURACOES), default=['busca_local'])
+    parser.add_argument("--por-camada", type=int, default=None, metavar="N",
+                        help="no máximo N instâncias por camada, espalhadas por tamanho")
+    parser.add_argument("--tempo-limite", type=float, default=None, metavar="SEGUNDOS",
+                        help="tempo máximo de cada execução")
+    parser.add_argument("--csv", metavar="ARQUIVO", default=None, help="grava uma linha por execução em CSV")
+    parser.add_argument("--gravar-base", metavar="ARQUIVO", default=None, help="grava os resultados como base")
+    parser.add_argument("--base", metavar="ARQUIVO", default=None, help="compara com uma base gravada antes")
+    parser.add_argument("--tolerancia-custo", type=float, default=0.0, metavar="PCT",
+                        help="piora de custo aceita por instância, em %% (padrão: nenhuma)")
+    parser.add_argument("--tolerancia-tempo", type=float, default=20.0, metavar="PCT",
+                        help="aumento de tempo aceito por camada, em %% (padrão: 20)")
+    parser.add_argument("--folga-tempo", type=float, default=0.5, metavar="SEGUNDOS",
+                        help="aumentos de tempo menores que isso nunca contam como regressão")
+    parser.add_argument("--executar", nargs=2, metavar=("CONFIGURACAO", "ARQUIVO"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar:
+        executar_uma(*args.executar)
+        return
+
+    referencias = ler_referencias(args.referencias)
+    arquivos = selecionar(args.pasta, args.camadas, args.por_camada)
+    if not arquivos:
+        print(f"Nenhuma instância das camadas {args.camadas} em {args.pasta}")
+        sys.exit(1)
+
+    resultados = []
+    for nome_configuracao in args.configuracoes:
+        print(f"{nome_configuracao}: {len(arquivos)} instâncias")
+        for arquivo in arquivos:
+            medicao = medir(nome_configuracao, arquivo, args.tempo_limite)
+            if medicao is None:
+                continue
+            instancia = os.path.splitext(os.path.basename(arquivo))[0]
+            referencia = referencias.get(instancia)
+            medicao.update(configuracao=nome_configuracao, instancia=instancia, camada=camada(instancia),
+                           referencia=referencia,
+                           gap=(medicao['custo'] - referencia) / referencia * 100 if referencia else None)
+            resultados.append(medicao)
+
+    imprimir_resumo(resumir(resultados))
+
+    if args.csv:
+        campos = ('configuracao', 'camada', 'instancia', 'custo', 'referencia', 'gap', 'rotas', 'tempo_leitura',
+                  'tempo_caminhos', 'tempo_solucao', 'tempo_total', 'rss_pico_kb')
+        with open(args.csv, 'w', newline='') as f:
+            escritor = csv.DictWriter(f, campos, extrasaction='ignore')
+            escritor.writeheader()
+            escritor.writerows(resultados)
+        print(f"\nResultados gravados em {args.csv}")
+
+    if args.gravar_base:
+        with open(args.gravar_base, 'w') as f:
+            json.dump({'configuracoes': args.configuracoes, 'resultados': resultados}, f, indent=1)
+        print(f"Base gravada em {args.gravar_base}")
+
+    if args.base:
+        with open(args.base) as f:
+            base = json.load(f)
+        print(f"\nComparação com {args.base}:")
+        regressoes = comparar(resultados, base, args.tolerancia_custo, args.tolerancia_tempo, args.folga_tempo)
+        if regressoes:
+            print(f"\n{len(regressoes)} regressões:")
+            for regressao in regressoes:
+                print(f"  {regressao}")
+            sys.exit(1)
+        print("\nSem regressões.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import hashlib
+import os
+
+import numpy as np
+
+# Incrementar quando o formato ou o significado das matrizes gravadas mudar
+VERSAO_FORMATO = 1
+
+
+def hash_grafo(verts, arestas, arcos, arestas_requeridas, arcos_requeridos, tipo_dist='<f8'):
+    """Calcula o hash do conteúdo de um grafo já lido, usado como chave do cache em disco."""
+    h = hashlib.sha256()
+    h.update(f"v{VERSAO_FORMATO}".encode())
+    for parte in (verts, arestas, arcos, arestas_requeridas, arcos_requeridos):
+        h.update(repr(list(parte)).encode())
+        h.update(b"|")
+    # Matrizes de outro tipo (float32 no modo de pouca memória) têm chave própria
+    if tipo_dist != '<f8':
+        h.update(tipo_dist.encode())
+    return h.hexdigest()
+
+
+def hash_arquivo(caminho):
+    """Chave de cache de um arquivo de instância: muda quando o arquivo é alterado."""
+    info = os.stat(caminho)
+    h = hashlib.sha256()
+    h.update(f"v{VERSAO_FORMATO}|{os.path.abspath(caminho)}|{info.st_size}|{info.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def _caminhos_arquivos(pasta, chave):
+    return (os.path.join(pasta, f"{chave}.dist.npy"),
+            os.path.join(pasta, f"{chave}.pred.npy"))
+
+
+def carregar(pasta, chave):
+    """Carrega (dist, pred) mapeados em memória, ou None se a chave não está no cache."""
+    arq_dist, arq_pred = _caminhos_arquivos(pasta, chave)
+    if not (os.path.exists(arq_dist) and os.path.exists(arq_pred)):
+        return None
+    try:
+        # Cópia na escrita: nada é lido de fato até ser acessado e alterações
+        # feitas em memória nunca voltam para o arquivo
+        dist = np.load(arq_dist, mmap_mode='c')
+        pred = np.load(arq_pred, mmap_mode='c')
+    except (OSError, ValueError):
+        return None  # Arquivo corrompido ou truncado: recalcula
+    if dist.shape != pred.shape:
+        return None
+    return dist, pred
+
+
+def salvar(pasta, chave, dist, pred):
+    """Grava (dist, pred) no cache; a escrita é atômica para execuções concorrentes."""
+    os.makedirs(pasta, exist_ok=True)
+    for arquivo, matriz in zip(_caminhos_arquivos(pasta, chave), (dist, pred)):
+        temporario = f"{arquivo}.{os.getpid()}.tmp"
+        with open(temporario, 'wb') as f:
+            np.save(f, np.ascontiguousarray(matriz))
+        os.replace(temporario, arquivo)
@@ -0,0 +1,251 @@
+import heapq
+import math
+
+import numpy as np
+
+# Razão medida entre o custo por operação do Dijkstra em Python puro e o do
+# Floyd-Warshall vetorizado; calibra a escolha automática do motor.
+RAZAO_CUSTO_DIJKSTRA = 10
+
+
+def montar_csr(n, origens, destinos, pesos):
+    """Monta a adjacência em formato CSR (offsets, alvos, pesos) a partir das ligações."""
+    origens = np.asarray(origens, dtype=np.int64)
+    destinos = np.asarray(destinos, dtype=np.int64)
+    pesos = np.asarray(pesos, dtype=np.float64)
+    ordem = np.argsort(origens, kind='stable')
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origens, minlength=n), out=offsets[1:])
+    return offsets, destinos[ordem], pesos[ordem]
+
+
+def escolher_metodo(n, qtd_ligacoes):
+    """Escolhe o motor de caminhos mínimos de acordo com a densidade do grafo."""
+    if n < 2:
+        return 'floyd'
+    # Floyd-Warshall custa O(n³); n execuções de Dijkstra custam O(n·(n + m)·log n)
+    custo_floyd = n * n
+    custo_dijkstra = RAZAO_CUSTO_DIJKSTRA * (n + qtd_ligacoes) * math.log2(n)
+    return 'floyd' if custo_floyd <= custo_dijkstra else 'dijkstra'
+
+
+def floyd_warshall_vetorizado(n, origens, destinos, pesos, tipo=np.float64):
+    """Floyd-Warshall min-plus por difusão de linhas; devolve (dist, pred) em índices."""
+    dist = np.full((n, n), math.inf, dtype=tipo)
+    pred = np.full((n, n), -1, dtype=np.int32)
+    # Ligações paralelas: fica a de menor custo
+    np.minimum.at(dist, (origens, destinos), pesos)
+    diagonal = np.arange(n)
+    dist[diagonal, diagonal] = 0.0
+    linhas, colunas = np.nonzero(dist < math.inf)
+    pred[linhas, colunas] = linhas
+    pred[diagonal, diagonal] = -1
+
+    via = np.empty_like(dist)
+    melhor = np.empty((n, n), dtype=bool)
+    for k in range(n):
+        # dist[i][k] + dist[k][j] para todos os pares de uma vez
+        np.add(dist[:, k, None], dist[k], out=via)
+        np.less(via, dist, out=melhor)
+        np.copyto(dist, via, where=melhor)
+        np.copyto(pred, pred[k], where=melhor)
+    return dist, pred
+
+
+def dijkstra_todos(n, offsets, alvos, pesos, tipo=np.float64):
+    """Executa Dijkstra a partir de cada vértice sobre a adjacência CSR."""
+    dist = np.empty((n, n), dtype=tipo)
+    pred = np.empty((n, n), dtype=np.int32)
+    # Listas Python são bem mais rápidas que arrays para acesso escalar
+    adjacencia = (offsets.tolist(), alvos.tolist(), pesos.tolist())
+    for origem in range(n):
+        dist[origem], pred[origem] = _dijkstra(*adjacencia, origem)
+    return dist, pred
+
+
+def dijkstra_fontes(offsets, alvos, pesos, fontes, tipo=np.float64, colunas=None):
+    """Distâncias a partir de cada vértice de `fontes`: matriz len(fontes)×n, ou só as
+    `colunas` pedidas (len(fontes)×len(colunas)) sem alocar as linhas inteiras."""
+    n = len(offsets) - 1
+    dist = np.empty((len(fontes), n if colunas is None else len(colunas)), dtype=tipo)
+    adjacencia = (offsets.tolist(), alvos.tolist(), pesos.tolist())
+    for k, origem in enumerate(fontes):
+        d = _dijkstra(*adjacencia, origem)[0]
+        dist[k] = d if colunas is None else [d[c] for c in colunas]
+    return dist
+
+
+def dijkstra_caminho(offsets, alvos, pesos, origem, destino):
+    """Caminho mínimo (lista de índices) e custo de origem a destino, ou (None, inf).
+
+    A CSR vem já convertida em listas (offsets.tolist(), ...), para que consultas repetidas
+    sobre o mesmo grafo não refaçam a conversão."""
+    d, p = _dijkstra(offsets, alvos, pesos, origem, destino)
+    if p[destino] < 0 and destino != origem:
+        return None, math.inf
+    caminho = [destino]
+    while caminho[-1] != origem:
+        caminho.append(p[caminho[-1]])
+    caminho.reverse()
+    return caminho, d[destino]
+
+
+def _dijkstra(offsets, alvos, pesos, origem, destino=None):
+    # Dijkstra sobre a CSR já convertida em listas; com destino, para assim que ele é fixado.
+    # Retorna (d, p): distâncias e predecessores (-1 quando não há) de cada vértice
+    n = len(offsets) - 1
+    inf = math.inf
+    heappush, heappop = heapq.heappush, heapq.heappop
+    d = [inf] * n
+    p = [-1] * n
+    d[origem] = 0.0
+    heap = [(0.0, origem)]
+    while heap:
+        du, u = heappop(heap)
+        if du > d[u]:
+            continue
+        if u == destino:
+            break
+        for k in range(offsets[u], offsets[u + 1]):
+            v = alvos[k]
+            nd = du + pesos[k]
+            if nd < d[v]:
+                d[v] = nd
+                p[v] = u
+                heappush(heap, (nd, v))
+    return d, p
+
+
+def relaxar_ligacao(dist, pred, a, b, peso):
+    """Atualiza dist/pred no lugar, em O(n²), quando a ligação a→b passa a custar `peso`.
+
+    Só vale para reduções: com custos não negativos, um caminho melhorado passa pela
+    ligação uma única vez (i → a, a → b, b → j). Retorna os índices das linhas alteradas.
+    """
+    via = dist[:, a, None] + peso + dist[b]
+    melhor = via < dist
+    linhas = np.flatnonzero(melhor.any(axis=1))
+    if linhas.size:
+        # Em i → ... → a → b → ... → j, o predecessor de j é o mesmo do caminho a partir de b
+        novo_pred = pred[b].copy()
+        novo_pred[b] = a
+        np.copyto(dist, via, where=melhor)
+        np.copyto(pred, novo_pred, where=melhor)
+    return linhas
+
+
+def reparar_aumento(dist, pred, ligacoes, direta, reversa):
+    """Corrige dist/pred no lugar depois que ligações a→b ficaram mais caras ou sumiram.
+
+    `ligacoes` lista (a, b, custo antigo); `direta` e `reversa` são as adjacências CSR de
+    saída e de entrada do grafo já alterado. Só os pares (i, j) cujo caminho mínimo podia
+    passar por alguma das ligações são refeitos: para cada origem i, um Dijkstra restrito a
+    esses destinos parte das distâncias ainda válidas dos demais vértices.
+    Retorna os índices das linhas alteradas.
+    """
+    n = len(dist)
+    afetados = np.zeros((n, n), dtype=bool)
+    for a, b, peso in ligacoes:
+        via = dist[:, a, None] + peso + dist[b]
+        afetados |= np.isfinite(via) & np.isclose(via, dist, rtol=1e-12, atol=1e-9)
+    np.fill_diagonal(afetados, False)
+    linhas = np.flatnonzero(afetados.any(axis=1))
+
+    offsets, alvos, pesos = (x.tolist() for x in direta)
+    offsets_rev, origens_rev, pesos_rev = (x.tolist() for x in reversa)
+    inf = math.inf
+    heappush, heappop = heapq.heappush, heapq.heappop
+
+    for origem in linhas.tolist():
+        destinos = np.flatnonzero(afetados[origem])
+        d = dist[origem].tolist()
+        p = pred[origem].tolist()
+        pendentes = set(destinos.tolist())
+        # Estimativa inicial de cada destino afetado: melhor entrada vinda de um vértice
+        # cuja distância não mudou
+        heap = []
+        for v in pendentes:
+            melhor, anterior = inf, -1
+            for k in range(offsets_rev[v], offsets_rev[v + 1]):
+                u = origens_rev[k]
+                if u not in pendentes and d[u] + pesos_rev[k] < melhor:
+                    melhor, anterior = d[u] + pesos_rev[k], u
+            d[v], p[v] = melhor, anterior
+            if anterior >= 0:
+                heap.append((melhor, v))
+        heapq.heapify(heap)
+        while heap:
+            du, u = heappop(heap)
+            if du > d[u]:
+                continue
+            for k in range(offsets[u], offsets[u + 1]):
+                v = alvos[k]
+                nd = du + pesos[k]
+                if v in pendentes and nd < d[v]:
+                    d[v] = nd
+                    p[v] = u
+                    heappush(heap, (nd, v))
+        dist[origem, destinos] = [d[v] for v in destinos.tolist()]
+        pred[origem, destinos] = [p[v] for v in destinos.tolist()]
+    return linhas
+
+
+def brandes_parcial(n, offsets, alvos, pesos, fontes):
+    """Soma das dependências de Brandes a partir das `fontes` (lista de tamanho n).
+    
+    Para cada fonte, um Dijkstra conta os caminhos mínimos (sigma) e guarda os predecessores;
+    depois as dependências são acumuladas na ordem inversa de fechamento dos vértices.
+    Recebe a adjacência CSR já convertida em listas.
+    """
+    centralidade = [0.0] * n
+    inf = math.inf
+    heappush, heappop = heapq.heappush, heapq.heappop
+    
+    for origem in fontes:
+        d = [inf] * n
+        sigma = [0] * n
+        preds = [[] for _ in range(n)]
+        fechado = bytearray(n)
+        ordem = []
+        d[origem] = 0.0
+        sigma[origem] = 1
+        heap = [(0.0, origem)]
+        while heap:
+            du, u = heappop(heap)
+            if fechado[u]:
+                continue
+            fechado[u] = 1
+            ordem.append(u)
+            for k in range(offsets[u], offsets[u + 1]):
+                v = alvos[k]
+                nd = du + pesos[k]
+                if nd < d[v]:
+                    d[v] = nd
+                    sigma[v] = sigma[u]
+                    preds[v] = [u]
+                    heappush(heap, (nd, v))
+                elif nd == d[v] and not fechado[v] and preds[v][-1] != u:
+                    # Outro caminho mínimo; ligações paralelas de u não contam duas vezes
+                    sigma[v] += sigma[u]
+                    preds[v].append(u)
+        
+        delta = [0.0] * n
+        for w in reversed(ordem):
+            coef = (1.0 + delta[w]) / sigma[w]
+            for u in preds[w]:
+                delta[u] += sigma[u] * coef
+            if w != origem:
+                centralidade[w] += delta[w]
+    return centralidade
+
+
+def para_listas(verts, dist, pred):
+    """Converte as matrizes indexadas no formato (listas, rótulos de vértices) dos resolvedores."""
+    # O índice -1 cai no último elemento, que representa a ausência de predecessor
+    rotulos = np.array(list(verts) + [None], dtype=object)
+    return dist.tolist(), rotulos[pred].tolist()
+
+
+def linhas(matriz):
+    """Linhas da matriz como memoryviews: dist[i][j] como nas listas, sem um objeto por elemento."""
+    return [memoryview(linha) for linha in matriz]
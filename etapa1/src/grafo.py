@@ -1,8 +1,35 @@
 import sys
 import os
+import math
+import random
+import zipfile
+import multiprocessing
+from array import array
+
+import numpy as np
+
+import caminhos
+import cache_caminhos
+
+# Seções de uma instância .dat e o tipo de cada coluna das suas linhas de dados:
+# ReN = nó, demanda, custo de serviço; ReE/ReA = de, para, custo, demanda, custo de serviço;
+# EDGE/ARC = de, para, custo de travessia
+TIPOS_COLUNAS = {
+    "ReN": ('i', 'd', 'd'),
+    "ReE": ('i', 'i', 'd', 'd', 'd'),
+    "EDGE": ('i', 'i', 'd'),
+    "ReA": ('i', 'i', 'd', 'd', 'd'),
+    "ARC": ('i', 'i', 'd'),
+}
+SECOES = frozenset(TIPOS_COLUNAS)
+
+
+def _colunas_vazias():
+    return {secao: [array(tipo) for tipo in tipos] for secao, tipos in TIPOS_COLUNAS.items()}
+
 
 class Grafo:
-    def __init__(self):
+    def __init__(self, pasta_cache=None, pouca_memoria=False):
         self.info = {}
         self.vertices = set()
         self.arestas = []       # (from, to, t_cost)
@@ -10,137 +37,168 @@ class Grafo:
         self.vertices_requeridos = set()
         self.arestas_requeridas = []  # (from, to, t_cost, demand, s_cost)
         self.arcos_requeridos = []    # (from, to, t_cost, demand, s_cost)
+        self.servicos_vertices = {}   # node -> (demand, s_cost)
+        self.capacidade = None
+        # Caminhos mínimos calculados sob demanda: (chave, verts, dist, pred)
+        self._caminhos = None
+        self._caminhos_listas = None
+        # Distâncias só entre vértices-chave, calculadas sob demanda: (chave, vértices-chave, dist)
+        self._caminhos_reduzidos = None
+        # Matrizes adotadas de outro processo (memória compartilhada): os resolvedores as
+        # consultam no lugar, sem cópias em listas
+        self._caminhos_compartilhados = False
+        # Adjacência CSR montada sob demanda: (chave, verts, dirigida, não dirigida)
+        self._csr = None
+        # Apoio às consultas de caminho(): (chave, verts, índice por rótulo, CSR em listas ou None)
+        self._navegacao = None
+        # Pasta opcional onde a instância lida e as matrizes de caminhos mínimos persistem
+        # entre execuções
+        self.pasta_cache = pasta_cache
+        # Modo de pouca memória: distâncias em float32, resolvedores sem cópias em listas de
+        # objetos e, com pasta_cache, matrizes recém-calculadas mapeadas do disco
+        self.pouca_memoria = pouca_memoria
+        self.tipo_dist = np.float32 if pouca_memoria else np.float64
         
+    def __getstate__(self):
+        # Ao enviar o grafo para outro processo, os caches calculados (caminhos mínimos, CSR)
+        # ficam de fora: são recalculados lá ou recebidos por memória compartilhada
+        estado = self.__dict__.copy()
+        estado.update(_caminhos=None, _caminhos_listas=None, _caminhos_reduzidos=None,
+                      _caminhos_compartilhados=False, _csr=None, _navegacao=None)
+        return estado
+    
     def ler_dat(self, nome_arquivo):
+        # Com pasta_cache definida, a instância já lida é reaproveitada no formato binário
+        arquivo_npz = None
+        if self.pasta_cache is not None:
+            chave = cache_caminhos.hash_arquivo(nome_arquivo)
+            arquivo_npz = os.path.join(self.pasta_cache, f"{chave}.instancia.npz")
+            if os.path.exists(arquivo_npz):
+                try:
+                    self.ler_npz(arquivo_npz)
+                    return
+                except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                    pass  # Arquivo corrompido ou de outro formato: lê o texto
+        
+        self._ler_texto(nome_arquivo)
+        if arquivo_npz is not None:
+            os.makedirs(self.pasta_cache, exist_ok=True)
+            self.salvar_npz(arquivo_npz)
+    
+    def _ler_texto(self, nome_arquivo):
+        # Leitura em uma única passada: cada linha é lida uma vez e vai direto para as
+        # colunas da sua seção. O rótulo das linhas de dados (N4, E1, NrE1, A1, NrA1)
+        # é opcional e descartado.
+        colunas = _colunas_vazias()
+        secao = "header"
         with open(nome_arquivo, 'r') as f:
-            linhas = f.readlines()
-
-        current_section = "header"
-        for linha in linhas:
-            linha = linha.strip()
-            if not linha or linha.startswith('#'):
-                continue
-
-            # Detecção de seções
-            if linha.startswith("ReN"):
-                current_section = "ReN"
-                continue
-            elif linha.startswith("ReE"):
-                current_section = "ReE"
-                continue
-            elif linha.startswith(("EDGE", "NrE")):
-                current_section = "EDGE"
-                continue
-            elif linha.startswith("ReA"):
-                current_section = "ReA"
-                continue
-            elif linha.startswith(("ARC", "NrA")):
-                current_section = "ARC"
-                continue
-
-            # Processamento por seção
-            if current_section == "header":
-                if ":" in linha:
-                    chave, valor = linha.split(":", 1)
-                    self.info[chave.strip()] = valor.strip()
-            
-            elif current_section == "ReN":
+            for linha in f:
                 tokens = linha.split()
-                if len(tokens) < 3:
-                    continue
-                try:
-                    # Verificar se o primeiro token começa com 'N' ou é um número
-                    if tokens[0].startswith("N"):
-                        node = int(tokens[0][1:])
-                    else:
-                        # Tentar converter diretamente para inteiro
-                        node = int(tokens[0])
-                    
-                    # Garantir que temos pelo menos demanda e custo
-                    if len(tokens) >= 3:
-                        demand = float(tokens[1])
-                        s_cost = float(tokens[2])
-                        self.vertices_requeridos.add(node)
-                        self.vertices.add(node)
-                except (ValueError, IndexError):
+                if not tokens or tokens[0].startswith('#'):
                     continue
                 
-            elif current_section == "ReE":
-                tokens = linha.split()
-                has_e = tokens[0].startswith("E")
-                min_tokens = 6 if has_e else 5
-                if len(tokens) < min_tokens:
-                    continue
-                try:
-                    idx = 1 if has_e else 0
-                    from_node = int(tokens[idx])
-                    to_node = int(tokens[idx+1])
-                    t_cost = float(tokens[idx+2])
-                    demand = float(tokens[idx+3])
-                    s_cost = float(tokens[idx+4])
-                    self.arestas_requeridas.append((from_node, to_node, t_cost, demand, s_cost))
-                    self.vertices.update([from_node, to_node])
-                except (ValueError, IndexError):
+                # Detecção de seções pelo cabeçalho (ReN., ReE., EDGE, ReA., ARC)
+                nome = tokens[0].rstrip('.')
+                if nome in SECOES:
+                    secao = nome
                     continue
                 
-            elif current_section == "EDGE":
-                tokens = linha.split()
-                if tokens[0] in ("EDGE", "NrE") or tokens[0].startswith("NrE"):
-                    continue
-                try:
-                    if tokens[0].startswith("NrE"):
-                        from_node = int(tokens[1])
-                        to_node = int(tokens[2])
-                        t_cost = float(tokens[3])
-                    else:
-                        from_node = int(tokens[0])
-                        to_node = int(tokens[1])
-                        t_cost = float(tokens[2])
-                    self.arestas.append((from_node, to_node, t_cost))
-                    self.vertices.update([from_node, to_node])
-                except (ValueError, IndexError):
+                if secao == "header":
+                    if ":" in linha:
+                        chave, valor = linha.split(":", 1)
+                        self.info[chave.strip()] = valor.strip()
                     continue
-            
-            elif current_section == "ReA":
-                tokens = linha.split()
-                has_a = tokens[0].startswith("A")
-                min_tokens = 6 if has_a else 5
-                if len(tokens) < min_tokens:
-                    continue
-                try:
-                    idx = 1 if has_a else 0
-                    from_node = int(tokens[idx])
-                    to_node = int(tokens[idx+1])
-                    t_cost = float(tokens[idx+2])
-                    demand = float(tokens[idx+3])
-                    s_cost = float(tokens[idx+4])
-                    self.arcos_requeridos.append((from_node, to_node, t_cost, demand, s_cost))
-                    self.vertices.update([from_node, to_node])
-                except (ValueError, IndexError):
-                    continue
-            
-            elif current_section == "ARC":
-                tokens = linha.split()
-                if tokens[0] in ("ARC", "NrA") or tokens[0].startswith("NrA"):
+                
+                if tokens[0][0].isalpha():
+                    rotulo, valores = tokens[0], tokens[1:]
+                else:
+                    rotulo, valores = None, tokens
+                # O número do vértice requerido vem no rótulo (N4) ou como primeiro valor
+                if secao == "ReN" and rotulo is not None:
+                    valores = [rotulo.lstrip('N')] + valores
+                destino = colunas[secao]
+                if len(valores) < len(destino):
                     continue
                 try:
-                    if tokens[0].startswith("NrA"):
-                        from_node = int(tokens[1])
-                        to_node = int(tokens[2])
-                        t_cost = float(tokens[3])
+                    if secao == "ReN":
+                        destino[0].append(int(valores[0]))
+                        destino[1].append(float(valores[1]))
+                        destino[2].append(float(valores[2]))
                     else:
-                        from_node = int(tokens[0])
-                        to_node = int(tokens[1])
-                        t_cost = float(tokens[2])
-                    self.arcos.append((from_node, to_node, t_cost))
-                    self.vertices.update([from_node, to_node])
-                except (ValueError, IndexError):
-                    continue
+                        destino[0].append(int(valores[0]))
+                        destino[1].append(int(valores[1]))
+                        for coluna, valor in zip(destino[2:], valores[2:]):
+                            coluna.append(float(valor))
+                except ValueError:
+                    # Linha malformada: desfaz o que já tinha entrado nas colunas
+                    tamanho = min(len(coluna) for coluna in destino)
+                    for coluna in destino:
+                        del coluna[tamanho:]
+        
+        self._carregar_colunas(colunas)
+    
+    def _carregar_colunas(self, colunas):
+        # Monta as listas de tuplas usadas pelo restante do código a partir das colunas
+        nos, demandas, custos = (list(c) for c in colunas["ReN"])
+        self.vertices_requeridos = set(nos)
+        self.servicos_vertices = {v: (d, c) for v, d, c in zip(nos, demandas, custos)}
+        self.arestas_requeridas = list(zip(*(list(c) for c in colunas["ReE"])))
+        self.arestas = list(zip(*(list(c) for c in colunas["EDGE"])))
+        self.arcos_requeridos = list(zip(*(list(c) for c in colunas["ReA"])))
+        self.arcos = list(zip(*(list(c) for c in colunas["ARC"])))
+        
+        self.vertices = set(nos)
+        for secao in ("ReE", "EDGE", "ReA", "ARC"):
+            self.vertices.update(colunas[secao][0])
+            self.vertices.update(colunas[secao][1])
         
         # Garantir que o depósito esteja incluído nos vértices
         if 'Depot Node' in self.info:
             deposito = int(self.info['Depot Node'])
             self.vertices.add(deposito)
+        if 'Capacity' in self.info:
+            self.capacidade = int(self.info['Capacity'])
+        self.invalidar_caminhos()
+    
+    def salvar_npz(self, caminho):
+        """Grava a instância lida em formato binário compacto (.npz)."""
+        colunas = self._colunas()
+        arrays = {
+            "versao": np.array(cache_caminhos.VERSAO_FORMATO),
+            "info_chaves": np.array(list(self.info.keys()), dtype=str),
+            "info_valores": np.array(list(self.info.values()), dtype=str),
+        }
+        for secao, tipos in TIPOS_COLUNAS.items():
+            for k, (coluna, tipo) in enumerate(zip(colunas[secao], tipos)):
+                arrays[f"{secao}_{k}"] = np.frombuffer(coluna, dtype=tipo)
+        # Escrita atômica: o nome temporário termina em .npz para o NumPy não acrescentar a extensão
+        temporario = f"{caminho}.{os.getpid()}.tmp.npz"
+        np.savez(temporario, **arrays)
+        os.replace(temporario, caminho)
+    
+    def ler_npz(self, caminho):
+        """Carrega uma instância gravada por salvar_npz."""
+        with np.load(caminho) as dados:
+            if int(dados["versao"]) != cache_caminhos.VERSAO_FORMATO:
+                raise ValueError(f"Versão de formato incompatível em {caminho}")
+            self.info = dict(zip(dados["info_chaves"].tolist(), dados["info_valores"].tolist()))
+            colunas = {secao: [dados[f"{secao}_{k}"].tolist() for k in range(len(tipos))]
+                       for secao, tipos in TIPOS_COLUNAS.items()}
+        self._carregar_colunas(colunas)
+    
+    def _colunas(self):
+        # Caminho inverso de _carregar_colunas, usado na gravação binária
+        colunas = _colunas_vazias()
+        for v in sorted(self.vertices_requeridos):
+            demanda, custo = self.servicos_vertices.get(v, (1.0, 1.0))
+            for coluna, valor in zip(colunas["ReN"], (v, demanda, custo)):
+                coluna.append(valor)
+        for secao, ligacoes in (("ReE", self.arestas_requeridas), ("EDGE", self.arestas),
+                                ("ReA", self.arcos_requeridos), ("ARC", self.arcos)):
+            for ligacao in ligacoes:
+                for coluna, valor in zip(colunas[secao], ligacao):
+                    coluna.append(valor)
+        return colunas
 
     # Métodos para estatísticas
     def qtd_vertices(self):
@@ -170,166 +228,347 @@ class Grafo:
         return total_edges / max_edges
     
     def grau_min_max(self):
-        graus = {}
-        # Graus para vértices (arestas não direcionadas)
-        for (u, v, *_) in self.arestas + self.arestas_requeridas:
-            graus[u] = graus.get(u, 0) + 1
-            graus[v] = graus.get(v, 0) + 1
-        # Graus para arcos (somente entrada não conta aqui, apenas saída incrementa)
-        for (u, v, *_) in self.arcos + self.arcos_requeridos:
-            graus[u] = graus.get(u, 0) + 1
-        if graus:
-            return (min(graus.values()), max(graus.values()))
+        # Grau de saída na visão dirigida: arestas contam para as duas extremidades e arcos
+        # só para a origem; vértices sem ligação de saída ficam de fora
+        _, offsets, _, _ = self.csr()
+        graus = np.diff(offsets)
+        graus = graus[graus > 0]
+        if graus.size > 0:
+            return (int(graus.min()), int(graus.max()))
         else:
             return (0, 0)
 
     # Métodos adicionais para componentes conectados, betweenness, caminho médio, diâmetro e Floyd-Warshall
     def componentes_conectados(self):
         # Considera arcos/arestas como não direcionados para cálculo de componentes
-        adj = {v: [] for v in self.vertices}
-        # Arestas (não direcionadas)
-        for (u, v, _) in self.arestas:
-            adj[u].append(v)
-            adj[v].append(u)
-        for (u, v, _, _, _) in self.arestas_requeridas:
-            adj[u].append(v)
-            adj[v].append(u)
-        # Arcos (tratados como não direcionados para conectividade)
-        for (u, v, _) in self.arcos:
-            adj[u].append(v)
-            adj[v].append(u)
-        for (u, v, _, _, _) in self.arcos_requeridos:
-            adj[u].append(v)
-            adj[v].append(u)
-        visited = set()
+        verts, offsets, alvos, _ = self.csr(dirigido=False)
+        offsets = offsets.tolist()
+        alvos = alvos.tolist()
+        visitado = bytearray(len(verts))
         count = 0
-        for v in self.vertices:
-            if v not in visited:
+        for v in range(len(verts)):
+            if not visitado[v]:
                 count += 1
+                visitado[v] = 1
                 stack = [v]
                 while stack:
                     curr = stack.pop()
-                    if curr not in visited:
-                        visited.add(curr)
-                        for w in adj.get(curr, []):
-                            if w not in visited:
-                                stack.append(w)
+                    for w in alvos[offsets[curr]:offsets[curr + 1]]:
+                        if not visitado[w]:
+                            visitado[w] = 1
+                            stack.append(w)
         return count
 
-    def floyd_warshall(self):
-        import math
+    def _ligacoes_indexadas(self):
+        # Lista as ligações dirigidas no espaço de índices (arestas nos dois sentidos)
         verts = sorted(self.vertices)
         index = {v: i for i, v in enumerate(verts)}
+        origens, destinos, pesos = [], [], []
+        for (u, v, t, *_) in self.arestas + self.arestas_requeridas:
+            origens += (index[u], index[v])
+            destinos += (index[v], index[u])
+            pesos += (t, t)
+        for (u, v, t, *_) in self.arcos + self.arcos_requeridos:
+            origens.append(index[u])
+            destinos.append(index[v])
+            pesos.append(t)
+        return verts, origens, destinos, pesos
+
+    def _chave_caminhos(self):
+        # Retrato do conteúdo do grafo: qualquer mudança em vértices, arestas ou arcos
+        # produz uma chave diferente e invalida os caminhos mínimos em cache
+        return (frozenset(self.vertices), tuple(self.arestas), tuple(self.arcos),
+                tuple(self.arestas_requeridas), tuple(self.arcos_requeridos))
+
+    def invalidar_caminhos(self):
+        self._caminhos = None
+        self._caminhos_listas = None
+        self._caminhos_reduzidos = None
+        self._caminhos_compartilhados = False
+        self._csr = None
+        self._navegacao = None
+    
+    def csr(self, dirigido=True):
+        # Adjacência CSR no espaço de índices: (verts, offsets, alvos, pesos), com os vizinhos
+        # de i em alvos[offsets[i]:offsets[i + 1]]. Na visão dirigida as arestas aparecem nos
+        # dois sentidos e os arcos só no seu; na não dirigida os arcos também são invertidos.
+        # As duas visões são montadas uma única vez e reaproveitadas enquanto o grafo não mudar.
+        chave = self._chave_caminhos()
+        if self._csr is None or self._csr[0] != chave:
+            verts, origens, destinos, pesos = self._ligacoes_indexadas()
+            n = len(verts)
+            dirigida = caminhos.montar_csr(n, origens, destinos, pesos)
+            nao_dirigida = caminhos.montar_csr(n, origens + destinos, destinos + origens, pesos + pesos)
+            self._csr = (chave, verts, dirigida, nao_dirigida)
+        _, verts, dirigida, nao_dirigida = self._csr
+        return (verts,) + (dirigida if dirigido else nao_dirigida)
+
+    def caminhos_minimos(self, metodo='auto'):
+        # Caminhos mínimos entre todos os pares no espaço de índices: (verts, dist, pred),
+        # com pred[i][j] = índice do predecessor de j no caminho a partir de i (-1 se não há).
+        # O resultado é calculado uma única vez e reaproveitado enquanto o grafo não mudar;
+        # o motor ('floyd' vetorizado ou 'dijkstra' repetido sobre CSR) é escolhido pela
+        # densidade quando 'auto'. Com pasta_cache definida, as matrizes também são
+        # gravadas em disco e carregadas mapeadas em memória nas execuções seguintes.
+        chave = self._chave_caminhos()
+        if self._caminhos is not None and self._caminhos[0] == chave:
+            return self._caminhos[1:]
+
+        verts, offsets, alvos, pesos = self.csr()
         n = len(verts)
-        # Inicialização de distâncias
-        dist = [[math.inf] * n for _ in range(n)]
-        next_node = [[None] * n for _ in range(n)]
-        for i in range(n):
-            dist[i][i] = 0.0
-            next_node[i][i] = verts[i]
-        # Arestas (não direcionadas)
-        for (u, v, t) in self.arestas:
-            i, j = index[u], index[v]
-            if t < dist[i][j]:
-                dist[i][j] = t
-                dist[j][i] = t
-                next_node[i][j] = v
-                next_node[j][i] = u
-        for (u, v, t, _, _) in self.arestas_requeridas:
-            i, j = index[u], index[v]
-            if t < dist[i][j]:
-                dist[i][j] = t
-                dist[j][i] = t
-                next_node[i][j] = v
-                next_node[j][i] = u
-        # Arcos (direcionados)
-        for (u, v, t) in self.arcos:
-            i, j = index[u], index[v]
-            if t < dist[i][j]:
-                dist[i][j] = t
-                next_node[i][j] = v
-        for (u, v, t, _, _) in self.arcos_requeridos:
-            i, j = index[u], index[v]
-            if t < dist[i][j]:
-                dist[i][j] = t
-                next_node[i][j] = v
-        # Floyd-Warshall principal
-        for k in range(n):
-            for i in range(n):
-                for j in range(n):
-                    if dist[i][k] + dist[k][j] < dist[i][j]:
-                        dist[i][j] = dist[i][k] + dist[k][j]
-                        next_node[i][j] = next_node[i][k]
-        # Montar matriz de predecessores
-        pred = [[None] * n for _ in range(n)]
-        for i in range(n):
-            for j in range(n):
-                if i == j or next_node[i][j] is None:
-                    pred[i][j] = None
-                else:
-                    cur = i
-                    target = verts[j]
-                    # Se o próximo de i para j já é j, então predecessor é i
-                    if next_node[cur][j] == target:
-                        pred[i][j] = verts[cur]
-                    else:
-                        # Avança até encontrar penúltimo nó antes de j
-                        while next_node[cur][j] != target:
-                            cur = index[next_node[cur][j]]
-                        pred[i][j] = verts[cur]
-        return dist, pred
+        chave_disco = None
+        if self.pasta_cache:
+            chave_disco = cache_caminhos.hash_grafo(verts, self.arestas, self.arcos,
+                                                    self.arestas_requeridas, self.arcos_requeridos,
+                                                    np.dtype(self.tipo_dist).str)
+            matrizes = cache_caminhos.carregar(self.pasta_cache, chave_disco)
+            if matrizes is not None and matrizes[0].shape == (n, n) and matrizes[0].dtype == self.tipo_dist:
+                self._caminhos = (chave, verts) + matrizes
+                self._caminhos_listas = None
+                return self._caminhos[1:]
+
+        if metodo == 'auto':
+            metodo = caminhos.escolher_metodo(n, len(alvos))
+        if metodo == 'floyd':
+            origens = np.repeat(np.arange(n), np.diff(offsets))
+            dist, pred = caminhos.floyd_warshall_vetorizado(n, origens, alvos, pesos, self.tipo_dist)
+        elif metodo == 'dijkstra':
+            dist, pred = caminhos.dijkstra_todos(n, offsets, alvos, pesos, self.tipo_dist)
+        else:
+            raise ValueError(f"Método de caminhos mínimos desconhecido: {metodo}")
+        if chave_disco is not None:
+            cache_caminhos.salvar(self.pasta_cache, chave_disco, dist, pred)
+            if self.pouca_memoria:
+                # As cópias mapeadas do disco podem sair da memória quando não estão em uso
+                dist, pred = cache_caminhos.carregar(self.pasta_cache, chave_disco) or (dist, pred)
+        self._caminhos = (chave, verts, dist, pred)
+        self._caminhos_listas = None
+        return self._caminhos[1:]
+
+    def usar_caminhos(self, dist, pred):
+        # Adota matrizes de caminhos mínimos já calculadas para o grafo atual (por exemplo,
+        # em memória compartilhada por outro processo), sem copiá-las nem recalcular
+        verts = sorted(self.vertices)
+        if dist.shape != (len(verts), len(verts)) or pred.shape != dist.shape:
+            raise ValueError("Matrizes de caminhos mínimos incompatíveis com o grafo")
+        self._caminhos = (self._chave_caminhos(), verts, dist, pred)
+        self._caminhos_listas = None
+        self._caminhos_compartilhados = True
+    
+    def floyd_warshall(self, metodo='auto'):
+        # Mesmo resultado de caminhos_minimos() no formato usado pelos resolvedores:
+        # dist em listas e pred com rótulos de vértices (None quando não há).
+        # As listas são compartilhadas entre os chamadores e não devem ser alteradas.
+        verts, dist, pred = self.caminhos_minimos(metodo)
+        if self._caminhos_listas is None:
+            self._caminhos_listas = caminhos.para_listas(verts, dist, pred)
+        return self._caminhos_listas
+
+    def caminhos_reduzidos(self, chaves):
+        # Distâncias mínimas só entre os vértices-chave (por exemplo, depósito e extremidades
+        # dos serviços): (chaves, dist), com chaves ordenadas e dist K×K no espaço de índices
+        # delas. Um Dijkstra por vértice-chave sobre a CSR substitui os caminhos entre todos os
+        # pares e só K linhas de n ficam em memória; caminhos completos saem de caminho().
+        # Se os caminhos de todos os pares já estiverem calculados, a submatriz é recortada deles.
+        chaves = sorted(chaves)
+        chave = self._chave_caminhos()
+        if (self._caminhos_reduzidos is not None and self._caminhos_reduzidos[0] == chave
+                and self._caminhos_reduzidos[1] == chaves):
+            return self._caminhos_reduzidos[1:]
+
+        if self._caminhos is not None and self._caminhos[0] == chave:
+            _, verts, dist, _ = self._caminhos
+            index = {v: i for i, v in enumerate(verts)}
+            indices = [index[v] for v in chaves]
+            reduzida = dist[np.ix_(indices, indices)].astype(self.tipo_dist, copy=False)
+        else:
+            verts, offsets, alvos, pesos = self.csr()
+            index = {v: i for i, v in enumerate(verts)}
+            indices = [index[v] for v in chaves]
+            reduzida = caminhos.dijkstra_fontes(offsets, alvos, pesos, indices, self.tipo_dist, colunas=indices)
+        self._caminhos_reduzidos = (chave, chaves, np.ascontiguousarray(reduzida))
+        return self._caminhos_reduzidos[1:]
+
+    def usar_caminhos_reduzidos(self, chaves, dist):
+        # Adota uma matriz de caminhos_reduzidos() já calculada (ex.: em memória compartilhada)
+        chaves = sorted(chaves)
+        if dist.shape != (len(chaves), len(chaves)):
+            raise ValueError("Matriz reduzida incompatível com os vértices-chave")
+        self._caminhos_reduzidos = (self._chave_caminhos(), chaves, dist)
+        self._caminhos_compartilhados = True
+
+    def caminho(self, origem, destino):
+        # Caminho mínimo entre dois vértices (rótulos) e o seu custo, ou (None, inf).
+        # Usa a matriz pred quando os caminhos entre todos os pares já estão calculados;
+        # senão, um Dijkstra a partir da origem que para ao alcançar o destino. O índice dos
+        # rótulos e a CSR em listas são montados uma vez e reaproveitados enquanto o grafo não mudar.
+        if origem == destino:
+            return [origem], 0
+        chave = self._chave_caminhos()
+        if self._navegacao is None or self._navegacao[0] != chave:
+            verts = sorted(self.vertices)
+            self._navegacao = (chave, verts, {v: i for i, v in enumerate(verts)}, None)
+        _, verts, index, adjacencia = self._navegacao
+        if self._caminhos is not None and self._caminhos[0] == chave:
+            _, _, dist, pred = self._caminhos
+            i, j = index[origem], index[destino]
+            if pred[i, j] < 0:
+                return None, math.inf
+            caminho = [j]
+            while caminho[-1] != i:
+                caminho.append(int(pred[i, caminho[-1]]))
+            return [verts[k] for k in reversed(caminho)], float(dist[i, j])
+        if adjacencia is None:
+            _, offsets, alvos, pesos = self.csr()
+            adjacencia = (offsets.tolist(), alvos.tolist(), pesos.tolist())
+            self._navegacao = (chave, verts, index, adjacencia)
+        caminho, custo = caminhos.dijkstra_caminho(*adjacencia, index[origem], index[destino])
+        if caminho is None:
+            return None, math.inf
+        return [verts[k] for k in caminho], custo
+
+    def distancias_resolvedor(self, chaves=None):
+        # Distâncias no formato dos resolvedores: (verts, dist em NumPy, dist por linhas, pred).
+        # As linhas são indexadas como dist[i][j]: listas de floats ou, no modo de pouca
+        # memória e com matrizes adotadas de memória compartilhada, memoryviews sobre a própria
+        # matriz. pred tem rótulos de vértices e só existe quando as listas são montadas com a
+        # matriz completa; senão é None e os caminhos saem de caminho(), que usa o pred em int32.
+        # Com `chaves`, a matriz é a reduzida de caminhos_reduzidos().
+        if chaves is not None:
+            verts, dist = self.caminhos_reduzidos(chaves)
+        else:
+            verts, dist, _ = self.caminhos_minimos()
+        if self.pouca_memoria or self._caminhos_compartilhados:
+            return verts, dist, caminhos.linhas(dist), None
+        if chaves is not None:
+            return verts, dist, dist.tolist(), None
+        return (verts, dist) + self.floyd_warshall()
+
+    def alterar_custo(self, u, v, custo, arco=False):
+        # Muda o custo de travessia de todas as ligações entre u e v: arestas nos dois
+        # sentidos ou, com arco=True, arcos u→v (requeridos ou não). Caminhos mínimos já
+        # calculados são atualizados no lugar, sem recalcular tudo.
+        self._alterar_ligacoes(u, v, arco, float(custo))
+
+    def remover_ligacao(self, u, v, arco=False):
+        # Remove as arestas (ou arcos u→v) não requeridos entre u e v, como alterar_custo.
+        # Ligações requeridas são serviços e não podem ser removidas.
+        self._alterar_ligacoes(u, v, arco, None)
+
+    def _alterar_ligacoes(self, u, v, arco, custo):
+        def coincide(ligacao):
+            return ligacao[:2] == (u, v) or (not arco and ligacao[:2] == (v, u))
+
+        nao_requeridas, requeridas = ((self.arcos, self.arcos_requeridos) if arco
+                                      else (self.arestas, self.arestas_requeridas))
+        if custo is None and any(coincide(l) for l in requeridas):
+            raise ValueError(f"A ligação requerida ({u}, {v}) é um serviço e não pode ser removida")
+
+        # Só vale atualizar incrementalmente caminhos que ainda correspondem ao grafo
+        atualizar = self._caminhos is not None and self._caminhos[0] == self._chave_caminhos()
+        if atualizar:
+            index = {w: i for i, w in enumerate(self._caminhos[1])}
+            a, b = index[u], index[v]
+            pares = [(a, b)] if arco else [(a, b), (b, a)]
+            antes = [self._peso_direto(i, j) for i, j in pares]
+
+        alteradas = 0
+        for ligacoes in (nao_requeridas, requeridas):
+            novas = []
+            for ligacao in ligacoes:
+                if coincide(ligacao):
+                    alteradas += 1
+                    if custo is None:
+                        continue
+                    ligacao = ligacao[:2] + (custo,) + ligacao[3:]
+                novas.append(ligacao)
+            ligacoes[:] = novas
+        if not alteradas:
+            tipo = "arco" if arco else "aresta"
+            raise ValueError(f"Não há {tipo} entre {u} e {v}")
+
+        if not atualizar:
+            self.invalidar_caminhos()
+            return
+        self._csr = None
+        _, verts, dist, pred = self._caminhos
+        depois = [self._peso_direto(i, j) for i, j in pares]
+
+        # Cada sentido é classificado pelo seu custo direto: uma ligação paralela (um arco ao
+        # lado da aresta, por exemplo) pode manter um sentido inalterado enquanto o outro muda
+        aumentos = [(i, j, peso_antes) for (i, j), peso_antes, peso_depois in zip(pares, antes, depois)
+                    if peso_depois > peso_antes]
+        reducoes = [(i, j, peso_depois) for (i, j), peso_antes, peso_depois in zip(pares, antes, depois)
+                    if peso_depois < peso_antes]
+        linhas = set()
+        if aumentos:
+            # Aumento (ou remoção): refaz só os pares cujo caminho mínimo podia usar a ligação
+            _, origens, destinos, pesos = self._ligacoes_indexadas()
+            _, *direta = self.csr()
+            reversa = caminhos.montar_csr(len(verts), destinos, origens, pesos)
+            linhas.update(caminhos.reparar_aumento(dist, pred, aumentos, direta, reversa).tolist())
+        for i, j, peso in reducoes:
+            # Redução: atualização O(n²) passando pela ligação
+            linhas.update(caminhos.relaxar_ligacao(dist, pred, i, j, peso).tolist())
+
+        self._caminhos = (self._chave_caminhos(), verts, dist, pred)
+        # As listas entregues por floyd_warshall() são corrigidas no lugar, para que os
+        # resolvedores que as guardam enxerguem os novos custos
+        if self._caminhos_listas is not None:
+            dist_listas, pred_listas = self._caminhos_listas
+            rotulos = np.array(list(verts) + [None], dtype=object)
+            for i in sorted(linhas):
+                dist_listas[i][:] = dist[i].tolist()
+                pred_listas[i][:] = rotulos[pred[i]].tolist()
+
+    def _peso_direto(self, i, j):
+        # Menor custo entre as ligações i→j (em índices), ou infinito se não houver
+        _, offsets, alvos, pesos = self.csr()
+        inicio, fim = offsets[i], offsets[i + 1]
+        custos = pesos[inicio:fim][alvos[inicio:fim] == j]
+        return float(custos.min()) if custos.size else math.inf
+
+    def descartar_listas(self):
+        # Libera as cópias em listas de floyd_warshall() (quem ainda as guarda continua com elas)
+        self._caminhos_listas = None
 
     def caminho_medio(self):
         # Calcula média das menores distâncias entre todos os pares de vértices
-        dist, _ = self.floyd_warshall()
-        n = len(dist)
-        total = 0.0
-        count = 0
-        for i in range(n):
-            for j in range(n):
-                if i != j and dist[i][j] != float('inf'):
-                    total += dist[i][j]
-                    count += 1
-        return (total / count) if count > 0 else 0.0
+        _, dist, _ = self.caminhos_minimos()
+        fora_diagonal = ~np.eye(len(dist), dtype=bool)
+        finitas = dist[fora_diagonal & np.isfinite(dist)]
+        return float(finitas.mean()) if finitas.size > 0 else 0.0
 
     def diametro(self):
         # Maior das menores distâncias entre pares de vértices
-        dist, _ = self.floyd_warshall()
-        max_dist = 0.0
-        n = len(dist)
-        for i in range(n):
-            for j in range(n):
-                if i != j and dist[i][j] != float('inf'):
-                    if dist[i][j] > max_dist:
-                        max_dist = dist[i][j]
-        return max_dist
-
-    def betweenness(self):
-        # Calcula a intermediação de todos os vértices pelos caminhos mais curtos
-        dist, pred = self.floyd_warshall()
-        verts = sorted(self.vertices)
-        index = {v: i for i, v in enumerate(verts)}
+        _, dist, _ = self.caminhos_minimos()
+        finitas = dist[np.isfinite(dist)]
+        return float(finitas.max()) if finitas.size > 0 else 0.0
+
+    def betweenness(self, trabalhadores=1, amostras=None, semente=None):
+        # Intermediação pelo algoritmo de Brandes: um Dijkstra por vértice de origem sobre
+        # a adjacência CSR, com cada caminho mínimo empatado contribuindo com a sua fração.
+        # Com `amostras` = k, só k origens sorteadas são usadas e o resultado é escalado por
+        # n / k (aproximação para instâncias grandes). Com trabalhadores > 1, as origens
+        # são divididas entre processos.
+        verts, offsets, alvos, pesos = self.csr()
         n = len(verts)
-        bet = {v: 0 for v in verts}
-        for i in range(n):
-            for j in range(n):
-                if i == j:
-                    continue
-                # Se não há caminho (predecessor nulo), pula
-                if pred[i][j] is None:
-                    continue
-                # Reconstrói o caminho de i até j usando pred
-                cur = j
-                path_idx = []
-                while cur != i:
-                    path_idx.append(cur)
-                    cur = index[pred[i][cur]]
-                # path_idx = [j, ..., i]
-                # Conta os vértices intermediários (exclui j e i)
-                if len(path_idx) > 2:
-                    for node_idx in path_idx[1:-1]:
-                        bet[verts[node_idx]] += 1
-        return bet
+        fontes = list(range(n))
+        escala = 1.0
+        if amostras is not None and amostras < n:
+            fontes = random.Random(semente).sample(fontes, amostras)
+            escala = n / amostras if amostras > 0 else 0.0
+        
+        adjacencia = (offsets.tolist(), alvos.tolist(), pesos.tolist())
+        if trabalhadores > 1 and len(fontes) > 1:
+            blocos = [fontes[i::trabalhadores] for i in range(trabalhadores)]
+            with multiprocessing.Pool(trabalhadores) as pool:
+                parciais = pool.starmap(caminhos.brandes_parcial,
+                                        [(n,) + adjacencia + (bloco,) for bloco in blocos if bloco])
+            bet = [sum(valores) for valores in zip(*parciais)]
+        else:
+            bet = caminhos.brandes_parcial(n, *adjacencia, fontes)
+        return {v: bet[i] * escala for i, v in enumerate(verts)}
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
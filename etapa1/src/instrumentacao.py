@@ -0,0 +1,86 @@
+import csv
+import io
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from lote import gravar_atomico
+
+
+class Instrumentacao:
+    """Coleta opcional de tempos por etapa, contagens por operador e evolução do custo.
+
+    Os resolvedores só chamam estes métodos quando recebem uma instância; sem ela, o custo
+    da instrumentação é uma comparação com None por chamada de operador.
+    """
+
+    def __init__(self):
+        self.inicio = time.perf_counter_ns()
+        self.etapas = {}  # nome -> nanossegundos acumulados
+        # nome -> [chamadas, puladas, movimentos avaliados, melhorias aplicadas, nanossegundos]
+        self.operadores = {}
+        self.trajetoria = []  # (nanossegundos desde o início, evento, custo)
+
+    @contextmanager
+    def etapa(self, nome):
+        """Mede o tempo de um bloco e o acumula na etapa `nome`."""
+        inicio = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.etapas[nome] = self.etapas.get(nome, 0) + time.perf_counter_ns() - inicio
+
+    def _operador(self, nome):
+        contagem = self.operadores.get(nome)
+        if contagem is None:
+            contagem = self.operadores[nome] = [0, 0, 0, 0, 0]
+        return contagem
+
+    def operador(self, nome, avaliados, melhorou, duracao):
+        """Registra uma varredura da vizinhança de um operador."""
+        contagem = self._operador(nome)
+        contagem[0] += 1
+        contagem[2] += avaliados
+        contagem[3] += bool(melhorou)
+        contagem[4] += duracao
+
+    def pulado(self, nome):
+        """Registra uma varredura evitada porque as rotas não mudaram desde a última."""
+        self._operador(nome)[1] += 1
+
+    def custo(self, evento, custo):
+        """Acrescenta um ponto à trajetória do custo da solução."""
+        self.trajetoria.append((time.perf_counter_ns() - self.inicio, evento, custo))
+
+    def resumo(self):
+        """Dicionário serializável com tudo o que foi coletado (tempos em segundos)."""
+        operadores = {}
+        for nome, (chamadas, puladas, avaliados, melhorias, duracao) in self.operadores.items():
+            operadores[nome] = {
+                'chamadas': chamadas,
+                'puladas': puladas,
+                'movimentos_avaliados': avaliados,
+                'melhorias': melhorias,
+                'taxa_aceitacao': melhorias / avaliados if avaliados else 0.0,
+                'tempo': duracao / 1e9,
+            }
+        return {
+            'etapas': {nome: duracao / 1e9 for nome, duracao in self.etapas.items()},
+            'operadores': operadores,
+            'trajetoria': [{'tempo': instante / 1e9, 'evento': evento, 'custo': custo}
+                           for instante, evento, custo in self.trajetoria],
+        }
+
+    def gravar(self, pasta_saida, nome_base, **extras):
+        """Grava perfil-<nome>.json (resumo completo) e perfil-<nome>.csv (trajetória do custo)."""
+        nome = os.path.splitext(nome_base)[0]
+        resumo = dict(extras, **self.resumo())
+        gravar_atomico(os.path.join(pasta_saida, f"perfil-{nome}.json"), json.dumps(resumo, indent=2))
+
+        texto = io.StringIO()
+        escritor = csv.writer(texto, lineterminator='\n')
+        escritor.writerow(('tempo', 'evento', 'custo'))
+        for instante, evento, custo in self.trajetoria:
+            escritor.writerow((f"{instante / 1e9:.6f}", evento, custo))
+        gravar_atomico(os.path.join(pasta_saida, f"perfil-{nome}.csv"), texto.getvalue())
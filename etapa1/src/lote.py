@@ -0,0 +1,127 @@
+import glob
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from multiprocessing.connection import wait
+
+
+def gravar_atomico(caminho, conteudo):
+    """Grava um arquivo de forma atômica: ou ele aparece completo, ou não aparece."""
+    pasta, nome = os.path.split(caminho)
+    # O temporário não segue o padrão sol-*.dat, então nunca é confundido com uma solução
+    temporario = os.path.join(pasta, f".{nome}.{os.getpid()}.tmp")
+    with open(temporario, 'w') as f:
+        f.write(conteudo)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+
+def zerar_pico_memoria():
+    """Recomeça a medição do pico de memória do processo (só no Linux; nos demais, não faz nada)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def pico_memoria():
+    """Pico de memória residente do processo em MB desde o último zerar_pico_memoria()."""
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    # Sem /proc: pico desde o início do processo (ru_maxrss em bytes no macOS, KB nos demais)
+    try:
+        import resource
+    except ImportError:
+        return 0.0  # Windows
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 2**20 if sys.platform == 'darwin' else pico / 1024
+
+
+def _remover_temporarios(pasta_saida, pid):
+    for temporario in glob.glob(os.path.join(pasta_saida, f".*.{pid}.tmp")):
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+
+
+def _executar_instancia(processar, arquivo, pasta_saida, argumentos):
+    # Ponto de entrada do processo filho: o código de saída informa o resultado
+    try:
+        sucesso = processar(arquivo, pasta_saida, *argumentos)
+    except Exception:
+        traceback.print_exc()
+        sys.exit(2)
+    sys.exit(0 if sucesso else 1)
+
+
+def executar_lote(arquivos, processar, pasta_saida, argumentos=(), trabalhadores=1, tempo_limite=None):
+    """Processa as instâncias e retorna (sucessos, falhas).
+
+    Com um trabalhador e sem tempo limite, tudo roda no próprio processo. Caso contrário,
+    cada instância roda em um processo separado, no máximo `trabalhadores` ao mesmo tempo:
+    uma falha grave ou um estouro de `tempo_limite` (segundos) afeta só aquela instância.
+    As maiores instâncias são escalonadas primeiro para equilibrar a carga.
+    """
+    if trabalhadores < 1:
+        raise ValueError(f"É preciso pelo menos um trabalhador (recebido {trabalhadores})")
+    # Tamanho do arquivo como estimativa do custo de cada instância
+    fila = deque(sorted(arquivos, key=os.path.getsize, reverse=True))
+    sucessos = 0
+    falhas = 0
+
+    if trabalhadores <= 1 and tempo_limite is None:
+        for arquivo in fila:
+            if processar(arquivo, pasta_saida, *argumentos):
+                sucessos += 1
+            else:
+                falhas += 1
+        return sucessos, falhas
+
+    ativos = {}  # sentinela -> (processo, arquivo, instante de início)
+    while fila or ativos:
+        while fila and len(ativos) < trabalhadores:
+            arquivo = fila.popleft()
+            processo = multiprocessing.Process(target=_executar_instancia,
+                                               args=(processar, arquivo, pasta_saida, argumentos))
+            processo.start()
+            ativos[processo.sentinel] = (processo, arquivo, time.monotonic())
+
+        espera = None
+        if tempo_limite is not None:
+            agora = time.monotonic()
+            espera = max(0.0, min(inicio + tempo_limite - agora for _, _, inicio in ativos.values()))
+
+        for sentinela in wait(list(ativos), timeout=espera):
+            processo, arquivo, _ = ativos.pop(sentinela)
+            processo.join()
+            if processo.exitcode == 0:
+                sucessos += 1
+            else:
+                falhas += 1
+                if processo.exitcode != 1:  # 1 = falha já relatada pela própria instância
+                    print(f"Erro ao processar {arquivo}: processo terminou com código {processo.exitcode}")
+                _remover_temporarios(pasta_saida, processo.pid)
+
+        if tempo_limite is not None:
+            agora = time.monotonic()
+            for sentinela, (processo, arquivo, inicio) in list(ativos.items()):
+                if agora - inicio >= tempo_limite:
+                    processo.terminate()
+                    processo.join()
+                    del ativos[sentinela]
+                    falhas += 1
+                    _remover_temporarios(pasta_saida, processo.pid)
+                    print(f"Tempo limite de {tempo_limite}s excedido: {arquivo}")
+
+    return sucessos, falhas
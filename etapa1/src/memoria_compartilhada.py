@@ -0,0 +1,41 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def exportar(*matrizes):
+    """Copia matrizes NumPy para blocos de memória compartilhada.
+    
+    Retorna (blocos, descritores): os blocos devem ser mantidos vivos e liberados com
+    liberar() pelo processo que os criou; os descritores (nome, forma, tipo) são leves e
+    podem ser enviados aos outros processos, que usam importar() para enxergar os dados.
+    """
+    blocos = []
+    descritores = []
+    for matriz in matrizes:
+        matriz = np.ascontiguousarray(matriz)
+        bloco = shared_memory.SharedMemory(create=True, size=max(matriz.nbytes, 1))
+        copia = np.ndarray(matriz.shape, dtype=matriz.dtype, buffer=bloco.buf)
+        copia[...] = matriz
+        blocos.append(bloco)
+        descritores.append((bloco.name, matriz.shape, matriz.dtype.str))
+    return blocos, descritores
+
+
+def importar(descritores):
+    """Abre os blocos descritos por exportar(); retorna (blocos, matrizes) sem copiar."""
+    blocos = []
+    matrizes = []
+    for nome, forma, tipo in descritores:
+        bloco = shared_memory.SharedMemory(name=nome)
+        blocos.append(bloco)
+        matrizes.append(np.ndarray(forma, dtype=np.dtype(tipo), buffer=bloco.buf))
+    return blocos, matrizes
+
+
+def liberar(blocos, remover=True):
+    """Fecha os blocos e, no processo que os criou, remove-os do sistema."""
+    for bloco in blocos:
+        bloco.close()
+        if remover:
+            bloco.unlink()
@@ -0,0 +1,207 @@
+from array import array
+from itertools import count
+
+import numpy as np
+
+# Tipos de serviço, guardados como códigos pequenos na tabela
+VERTICE, ARESTA, ARCO = 0, 1, 2
+NOMES_TIPOS = ('vertice', 'aresta', 'arco')
+
+# Versões das rotas: cada estado de rota recebe um número nunca repetido no processo
+_versoes = count(1)
+
+
+class TabelaServicos:
+    """Serviços requeridos em colunas compactas; o serviço de índice k tem ID k + 1."""
+
+    def __init__(self, grafo):
+        self.tipo = array('b')
+        self.de = array('i')
+        self.para = array('i')
+        self.demanda = array('d')
+        self.custo = array('d')
+
+        # Vértices requeridos primeiro (IDs a partir de 1), depois arestas e arcos
+        for v in sorted(grafo.vertices_requeridos):
+            demand, s_cost = grafo.servicos_vertices.get(v, (1, 1))
+            self._adicionar(VERTICE, v, v, demand, s_cost)
+        for u, v, t_cost, demand, s_cost in grafo.arestas_requeridas:
+            self._adicionar(ARESTA, u, v, demand, s_cost)
+        for u, v, t_cost, demand, s_cost in grafo.arcos_requeridos:
+            self._adicionar(ARCO, u, v, demand, s_cost)
+
+    def _adicionar(self, tipo, de, para, demanda, custo):
+        self.tipo.append(tipo)
+        self.de.append(de)
+        self.para.append(para)
+        self.demanda.append(demanda)
+        self.custo.append(custo)
+
+    def indexar(self, index):
+        """Guarda as extremidades dos serviços já convertidas para índices da matriz de distâncias."""
+        self.de_idx = array('i', (index[v] for v in self.de))
+        self.para_idx = array('i', (index[v] for v in self.para))
+
+    def extremidades(self):
+        """Vértices em que algum serviço começa ou termina."""
+        return set(self.de) | set(self.para)
+
+    def __len__(self):
+        return len(self.tipo)
+
+    def id(self, k):
+        return k + 1
+
+
+def vizinhos_mais_proximos(tabela, dist, k):
+    """Lista, para cada serviço, os k serviços mais próximos dele (do mais ao menos próximo).
+
+    A proximidade entre s e t é a menor ligação entre o fim de um e o início do outro,
+    calculada sobre a matriz de distâncias `dist` (NumPy) no espaço de índices.
+    """
+    n = len(tabela)
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+    de = np.frombuffer(tabela.de_idx, dtype=np.int32)
+    para = np.frombuffer(tabela.para_idx, dtype=np.int32)
+    ligacao = np.asarray(dist)[np.ix_(para, de)]  # ligacao[s][t] = dist(fim de s, início de t)
+    proximidade = np.minimum(ligacao, ligacao.T)
+    np.fill_diagonal(proximidade, np.inf)
+    candidatos = np.argpartition(proximidade, k - 1, axis=1)[:, :k]
+    ordem = np.argsort(np.take_along_axis(proximidade, candidatos, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(candidatos, ordem, axis=1).tolist()
+
+
+class IndiceProximidade:
+    """Serviço não atendido mais próximo de um vértice, respeitando a capacidade restante.
+    
+    Para cada vértice consultado guarda, uma única vez, os serviços ordenados pela distância
+    até o início deles; serviços atendidos são só marcados (remoção O(1)) e descartados
+    de forma preguiçosa do começo das listas. Empates seguem a ordem de `candidatos`.
+    Com `inverter_arestas`, cada aresta requerida também entra pelo sentido contrário
+    (começando em `para`), e o sentido escolhido é devolvido por mais_proximo_orientado.
+    """
+    
+    def __init__(self, tabela, dist, candidatos, inverter_arestas=False):
+        self.tabela = tabela
+        self.dist = dist  # matriz NumPy no espaço de índices
+        candidatos = np.asarray(candidatos, dtype=np.int64)
+        ordem = np.arange(len(candidatos))
+        # Entradas orientadas: 2 * serviço + sentido (1 = aresta percorrida de para até de)
+        self.entradas = 2 * candidatos
+        self.inicio = np.frombuffer(tabela.de_idx, dtype=np.int32)[candidatos]
+        self.ordem = ordem
+        if inverter_arestas:
+            arestas = np.frombuffer(tabela.tipo, dtype=np.int8)[candidatos] == ARESTA
+            self.entradas = np.concatenate((self.entradas, 2 * candidatos[arestas] + 1))
+            para = np.frombuffer(tabela.para_idx, dtype=np.int32)[candidatos[arestas]]
+            self.inicio = np.concatenate((self.inicio, para))
+            self.ordem = np.concatenate((ordem, ordem[arestas]))
+        # Só os candidatos ficam disponíveis; o resto conta como já atendido
+        self.atendido = bytearray(b'\x01') * len(tabela)
+        for servico in candidatos.tolist():
+            self.atendido[servico] = 0
+        self.restantes = len(candidatos)
+        self._listas = {}  # vértice -> (entradas, distâncias) em ordem crescente
+        self._inicio = {}  # vértice -> primeira posição que pode não estar atendida
+    
+    def _lista(self, vertice):
+        lista = self._listas.get(vertice)
+        if lista is None:
+            distancias = self.dist[vertice][self.inicio]
+            # Ordena por distância, depois pela ordem dos candidatos e pelo sentido;
+            # np.lexsort usa a última chave como principal
+            ordem = np.lexsort((self.entradas & 1, self.ordem, distancias))
+            ordem = ordem[np.isfinite(distancias[ordem])]  # Sem caminho: nunca é escolhido
+            lista = (self.entradas[ordem].tolist(), distancias[ordem].tolist())
+            self._listas[vertice] = lista
+            self._inicio[vertice] = 0
+        return lista
+    
+    def mais_proximo_orientado(self, vertice, capacidade):
+        """Retorna (serviço, sentido, distância) ou (None, 0, inf) se nenhum serviço cabe."""
+        entradas, distancias = self._lista(vertice)
+        atendido = self.atendido
+        demanda = self.tabela.demanda
+        
+        inicio = self._inicio[vertice]
+        while inicio < len(entradas) and atendido[entradas[inicio] >> 1]:
+            inicio += 1
+        self._inicio[vertice] = inicio
+        
+        for k in range(inicio, len(entradas)):
+            servico = entradas[k] >> 1
+            if not atendido[servico] and demanda[servico] <= capacidade:
+                return servico, entradas[k] & 1, distancias[k]
+        return None, 0, float('inf')
+    
+    def proximos_orientados(self, vertice, capacidade, quantidade):
+        """Até `quantidade` entradas (serviço, sentido, distância) mais próximas que cabem."""
+        entradas, distancias = self._lista(vertice)
+        atendido = self.atendido
+        demanda = self.tabela.demanda
+        encontrados = []
+        for k in range(self._inicio[vertice], len(entradas)):
+            servico = entradas[k] >> 1
+            if not atendido[servico] and demanda[servico] <= capacidade:
+                encontrados.append((servico, entradas[k] & 1, distancias[k]))
+                if len(encontrados) == quantidade:
+                    break
+        return encontrados
+    
+    def mais_proximo(self, vertice, capacidade):
+        """Retorna (serviço, distância) ou (None, inf) se nenhum serviço cabe."""
+        servico, _, distancia = self.mais_proximo_orientado(vertice, capacidade)
+        return servico, distancia
+    
+    def remover(self, servico):
+        if not self.atendido[servico]:
+            self.atendido[servico] = 1
+            self.restantes -= 1
+
+
+class Rota:
+    """Rota como sequência de índices de serviços, com carga e custo mantidos em cache.
+    
+    `versao` identifica o conteúdo atual da rota; quem altera a rota chama alterada().
+    """
+
+    __slots__ = ('id', 'servicos', 'demanda_total', 'custo_total', 'retorna_deposito', 'versao')
+
+    def __init__(self, id_rota, servicos=None):
+        self.id = id_rota
+        self.servicos = servicos if servicos is not None else []
+        self.demanda_total = 0.0
+        self.custo_total = 0
+        # False apenas quando não existe caminho de volta ao depósito
+        self.retorna_deposito = True
+        self.versao = next(_versoes)
+    
+    def alterada(self):
+        """Registra que a sequência ou o sentido dos serviços da rota mudou."""
+        self.versao = next(_versoes)
+
+    def total_visitas(self):
+        # Visita inicial ao depósito, uma por serviço e o retorno ao depósito
+        return len(self.servicos) + (2 if self.retorna_deposito else 1)
+
+
+def formatar_rota(rota, tabela, invertido=None):
+    """Formata uma rota no padrão de saída: cabeçalho da rota seguido das visitas.
+    
+    `invertido[k]` indica que o serviço k (aresta) é percorrido de `para` até `de`.
+    """
+    # Formato: índice_depósito dia_roteirização id_rota demanda_total custo_total total_visitas
+    linha = f"0 1 {rota.id} {rota.demanda_total} {rota.custo_total:.2f} {rota.total_visitas()}"
+
+    # Depósito, serviços na ordem da rota e depósito
+    visitas_formatadas = ["(D 0,1,1)"]
+    for k in rota.servicos:
+        de, para = tabela.de[k], tabela.para[k]
+        if invertido is not None and invertido[k]:
+            de, para = para, de
+        visitas_formatadas.append(f"(S {tabela.id(k)},{de},{para})")
+    visitas_formatadas.append("(D 0,1,1)")
+
+    return linha + " " + " ".join(visitas_formatadas)
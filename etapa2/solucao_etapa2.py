@@ -2,71 +2,43 @@ import os
 import sys
 import time
 import glob
+import argparse
+import math
 sys.path.append(os.path.abspath('../etapa1/src'))
 
 from grafo import Grafo
+from lote import executar_lote, gravar_atomico, zerar_pico_memoria, pico_memoria
+from servicos import TabelaServicos, Rota, IndiceProximidade, formatar_rota
 
 class SolucaoConstrutiva:
-    def __init__(self, grafo, capacidade_veiculo):
+    def __init__(self, grafo, capacidade_veiculo, matriz_reduzida=False):
         self.grafo = grafo
         self.capacidade_veiculo = capacidade_veiculo
         self.deposito = int(self.grafo.info.get('Depot Node', 1))
-        self.servicos_nao_atendidos = self._inicializar_servicos()
-        self.dist_matrix, self.pred_matrix = self.grafo.floyd_warshall()
-        self.verts = sorted(self.grafo.vertices)
+        self.servicos = TabelaServicos(self.grafo)
+        self.servicos_nao_atendidos = list(range(len(self.servicos)))
+        # Com matriz_reduzida, só o depósito e as extremidades dos serviços (os únicos vértices
+        # consultados) entram na matriz e os caminhos completos são recuperados pelo grafo
+        chaves = self.servicos.extremidades() | {self.deposito} if matriz_reduzida else None
+        self.verts, self.dist_numpy, self.dist_matrix, self.pred_matrix = self.grafo.distancias_resolvedor(chaves)
         self.index = {v: i for i, v in enumerate(self.verts)}
+        # Consultas de custo no laço principal usam só índices: dist[i][j]
+        self.dist = self.dist_matrix
+        self.deposito_idx = self.index[self.deposito]
+        self.servicos.indexar(self.index)
         self.rotas = []
         self.custo_total = 0
         self.tempo_inicio = 0
         self.tempo_fim = 0
         
-    def _inicializar_servicos(self):
-        """Inicializa a lista de serviços não atendidos com seus IDs e informações."""
-        servicos = []
-        
-        # Adicionar vértices requeridos (ID começa em 1)
-        id_servico = 1
-        for v in sorted(self.grafo.vertices_requeridos):
-            servicos.append({
-                'id': id_servico,
-                'tipo': 'vertice',
-                'de': v,
-                'para': v,
-                'demanda': 1,
-                'custo_servico': 1
-            })
-            id_servico += 1
-        
-        # Adicionar arestas requeridas
-        for u, v, t_cost, demand, s_cost in self.grafo.arestas_requeridas:
-            servicos.append({
-                'id': id_servico,
-                'tipo': 'aresta',
-                'de': u,
-                'para': v,
-                'demanda': demand,
-                'custo_servico': s_cost
-            })
-            id_servico += 1
-        
-        # Adicionar arcos requeridos
-        for u, v, t_cost, demand, s_cost in self.grafo.arcos_requeridos:
-            servicos.append({
-                'id': id_servico,
-                'tipo': 'arco',
-                'de': u,
-                'para': v,
-                'demanda': demand,
-                'custo_servico': s_cost
-            })
-            id_servico += 1
-            
-        return servicos
-    
     def _calcular_caminho(self, origem, destino):
         """Calcula o caminho mais curto entre dois vértices usando a matriz de predecessores."""
+        # Reconstrução completa do caminho: só é necessária para a saída; os custos
+        # consultados durante a construção e a busca local vêm direto de self.dist
         if origem == destino:
             return [origem], 0
+        if self.pred_matrix is None:
+            return self.grafo.caminho(origem, destino)
             
         i, j = self.index[origem], self.index[destino]
         if self.pred_matrix[i][j] is None:
@@ -86,55 +58,33 @@ class SolucaoConstrutiva:
     
     def _selecionar_proximo_servico(self, posicao_atual, capacidade_restante):
         """Seleciona o próximo serviço a ser atendido com base na proximidade e capacidade."""
-        melhor_servico = None
-        menor_distancia = float('inf')
-        
-        for servico in self.servicos_nao_atendidos:
-            # Verificar se o serviço cabe na capacidade restante
-            if servico['demanda'] > capacidade_restante:
-                continue
-                
-            # Calcular distância até o serviço
-            caminho, distancia = self._calcular_caminho(posicao_atual, servico['de'])
-            if caminho is None:
-                continue  # Não há caminho para este serviço
-                
-            if distancia < menor_distancia:
-                menor_distancia = distancia
-                melhor_servico = servico
-                
-        return melhor_servico, menor_distancia
+        # O índice devolve o não atendido mais próximo que cabe, sem varrer todos os serviços
+        return self.indice_proximidade.mais_proximo(posicao_atual, capacidade_restante)
     
     def construir_solucao(self):
         """Constrói uma solução inicial para o problema."""
         self.tempo_inicio = time.perf_counter_ns()
+        tabela = self.servicos
         
         # Ordenar serviços por proximidade ao depósito para melhorar a solução inicial
         servicos_ordenados = []
+        distancias = self.dist[self.deposito_idx]
         for servico in self.servicos_nao_atendidos:
-            caminho, distancia = self._calcular_caminho(self.deposito, servico['de'])
-            if caminho is not None:  # Garantir que há um caminho válido
+            distancia = distancias[tabela.de_idx[servico]]
+            if distancia != math.inf:  # Garantir que há um caminho válido
                 servicos_ordenados.append((servico, distancia))
         
         # Ordenar por distância e extrair apenas os serviços
         servicos_ordenados.sort(key=lambda x: x[1])
         self.servicos_nao_atendidos = [s[0] for s in servicos_ordenados]
+        self.indice_proximidade = IndiceProximidade(tabela, self.dist_numpy, self.servicos_nao_atendidos)
         
-        while self.servicos_nao_atendidos:
+        while self.indice_proximidade.restantes:
             # Iniciar nova rota
-            rota = {
-                'id': len(self.rotas) + 1,
-                'demanda_total': 0,
-                'custo_total': 0,
-                'visitas': [],
-                'servicos': []
-            }
+            rota = Rota(len(self.rotas) + 1)
             
             capacidade_restante = self.capacidade_veiculo
-            posicao_atual = self.deposito
-            
-            # Adicionar visita inicial ao depósito
-            rota['visitas'].append((self.deposito, self.deposito))
+            posicao_atual = self.deposito_idx
             
             while True:
                 # Selecionar próximo serviço
@@ -143,41 +93,36 @@ class SolucaoConstrutiva:
                 if servico is None:
                     # Não há mais serviços que caibam nesta rota
                     break
-                    
-                # Adicionar serviço à rota
-                rota['servicos'].append(servico)
-                rota['demanda_total'] += servico['demanda']
                 
-                # Adicionar custo de deslocamento até o serviço
-                rota['custo_total'] += distancia
+                # Adicionar serviço à rota
+                rota.servicos.append(servico)
+                rota.demanda_total += tabela.demanda[servico]
                 
-                # Adicionar custo do serviço
-                rota['custo_total'] += servico['custo_servico']
+                # Adicionar custo de deslocamento até o serviço e custo do serviço
+                rota.custo_total += distancia + tabela.custo[servico]
                 
                 # Atualizar capacidade restante
-                capacidade_restante -= servico['demanda']
+                capacidade_restante -= tabela.demanda[servico]
                 
                 # Atualizar posição atual
-                posicao_atual = servico['para']
-                
-                # Adicionar visita ao serviço
-                rota['visitas'].append((servico['de'], servico['para']))
+                posicao_atual = tabela.para_idx[servico]
                 
-                # Remover serviço da lista de não atendidos
-                self.servicos_nao_atendidos.remove(servico)
+                # Marcar o serviço como atendido
+                self.indice_proximidade.remover(servico)
                 
-                if not self.servicos_nao_atendidos:
+                if not self.indice_proximidade.restantes:
                     break
             
             # Adicionar retorno ao depósito
-            caminho_retorno, distancia_retorno = self._calcular_caminho(posicao_atual, self.deposito)
-            if caminho_retorno:
-                rota['custo_total'] += distancia_retorno
-                rota['visitas'].append((self.deposito, self.deposito))
+            distancia_retorno = self.dist[posicao_atual][self.deposito_idx]
+            if distancia_retorno != math.inf:
+                rota.custo_total += distancia_retorno
+            else:
+                rota.retorna_deposito = False
             
             # Adicionar rota à solução
             self.rotas.append(rota)
-            self.custo_total += rota['custo_total']
+            self.custo_total += rota.custo_total
             
         self.tempo_fim = time.perf_counter_ns()
         return self.rotas
@@ -194,49 +139,26 @@ class SolucaoConstrutiva:
         saida.append(f"{tempo_execucao}")
         
         for rota in self.rotas:
-            # Formato: índice_depósito dia_roteirização id_rota demanda_total custo_total total_visitas
-            total_visitas = len(rota['visitas'])
-            linha = f"0 1 {rota['id']} {rota['demanda_total']} {rota['custo_total']:.2f} {total_visitas}"
-            
-            # Adicionar visitas
-            visitas_formatadas = []
-            
-            # Primeira visita ao depósito
-            visitas_formatadas.append("(D 0,1,1)")
-            
-            # Visitas aos serviços
-            for i, servico in enumerate(rota['servicos']):
-                de, para = servico['de'], servico['para']
-                visitas_formatadas.append(f"(S {servico['id']},{de},{para})")
-            
-            # Última visita ao depósito
-            visitas_formatadas.append("(D 0,1,1)")
-            
-            linha += " " + " ".join(visitas_formatadas)
-            saida.append(linha)
+            saida.append(formatar_rota(rota, self.servicos))
             
         return "\n".join(saida)
 
-def processar_arquivo(arquivo_dat, pasta_saida):
+def processar_arquivo(arquivo_dat, pasta_saida, pasta_cache=None, matriz_reduzida=False, pouca_memoria=False):
     """Processa um arquivo .dat e salva o resultado na pasta de saída."""
     try:
+        zerar_pico_memoria()
         # Extrair o nome base do arquivo
         nome_base = os.path.basename(arquivo_dat)
         
         # Carregar grafo
-        g = Grafo()
+        g = Grafo(pasta_cache, pouca_memoria)
         g.ler_dat(arquivo_dat)
         
-        # Obter capacidade do veículo do arquivo
-        capacidade = 5  # Valor padrão
-        with open(arquivo_dat, 'r') as f:
-            for linha in f:
-                if linha.startswith("Capacity:"):
-                    capacidade = int(linha.split(":")[1].strip())
-                    break
+        # Capacidade do veículo, já lida junto com a instância
+        capacidade = g.capacidade if g.capacidade is not None else 5  # Valor padrão
         
         # Construir solução
-        solucao = SolucaoConstrutiva(g, capacidade)
+        solucao = SolucaoConstrutiva(g, capacidade, matriz_reduzida)
         solucao.construir_solucao()
         
         # Formatar saída
@@ -244,10 +166,9 @@ def processar_arquivo(arquivo_dat, pasta_saida):
         
         # Criar arquivo de saída
         arquivo_saida = os.path.join(pasta_saida, f"sol-{nome_base}")
-        with open(arquivo_saida, 'w') as f:
-            f.write(resultado)
+        gravar_atomico(arquivo_saida, resultado)
         
-        print(f"Processado: {nome_base} -> {arquivo_saida}")
+        print(f"Processado: {nome_base} -> {arquivo_saida} (pico de memória: {pico_memoria():.1f} MB)")
         return True
     except Exception as e:
         print(f"Erro ao processar {arquivo_dat}: {str(e)}")
@@ -255,17 +176,31 @@ def processar_arquivo(arquivo_dat, pasta_saida):
 
 def main():
     # Verificar argumentos
-    if len(sys.argv) != 2:
-        print("Uso: python processar_todos.py <pasta_dados>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Algoritmo construtivo para o NEARP.")
+    parser.add_argument("pasta_dados", help="pasta com os arquivos .dat")
+    parser.add_argument("--cache-caminhos", metavar="PASTA", default=None,
+                        help="pasta para gravar e reaproveitar as matrizes de caminhos mínimos")
+    parser.add_argument("--matriz-reduzida", action="store_true",
+                        help="distâncias só entre depósito e extremidades dos serviços (menos memória)")
+    parser.add_argument("--pouca-memoria", action="store_true",
+                        help="distâncias em float32, sem cópias em listas e mapeadas do disco com --cache-caminhos")
+    parser.add_argument("--workers", "--trabalhadores", type=int, default=1, metavar="N",
+                        help="número de processos para rodar instâncias em paralelo")
+    parser.add_argument("--tempo-limite", type=float, default=None, metavar="SEGUNDOS",
+                        help="tempo máximo por instância; ao estourar, a instância conta como falha")
+    args = parser.parse_args()
     
-    pasta_dados = sys.argv[1]
+    pasta_dados = args.pasta_dados
     
     # Verificar se a pasta existe
     if not os.path.isdir(pasta_dados):
         print(f"Erro: A pasta {pasta_dados} não existe.")
         sys.exit(1)
     
+    if args.workers < 1:
+        print(f"Erro: --workers deve ser pelo menos 1 (recebido {args.workers}).")
+        sys.exit(1)
+    
     # Criar pasta de saída G3Result se não existir
     pasta_saida = "G3Result"
     if not os.path.exists(pasta_saida):
@@ -281,15 +216,9 @@ def main():
     
     print(f"Encontrados {len(arquivos_dat)} arquivos .dat para processar.")
     
-    # Processar cada arquivo
-    sucessos = 0
-    falhas = 0
-    
-    for arquivo in arquivos_dat:
-        if processar_arquivo(arquivo, pasta_saida):
-            sucessos += 1
-        else:
-            falhas += 1
+    # Processar cada arquivo (as maiores instâncias primeiro)
+    sucessos, falhas = executar_lote(arquivos_dat, processar_arquivo, pasta_saida,
+                                     (args.cache_caminhos, args.matriz_reduzida, args.pouca_memoria), args.workers, args.tempo_limite)
     
     print(f"\nProcessamento concluído: {sucessos} arquivos processados com sucesso, {falhas} falhas.")
 
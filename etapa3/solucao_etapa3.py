@@ -2,78 +2,144 @@ import os
 import sys
 import time
 import glob
-import copy
+import argparse
 import math  
+import random
+import multiprocessing
+from array import array
+from collections import deque, namedtuple
+from contextlib import nullcontext
+
+import numpy as np
 sys.path.append(os.path.abspath('../etapa1/src'))
 
 from grafo import Grafo
+from lote import executar_lote, gravar_atomico, zerar_pico_memoria, pico_memoria
+from instrumentacao import Instrumentacao
+import caminhos
+import memoria_compartilhada
+from servicos import ARESTA, TabelaServicos, Rota, IndiceProximidade, formatar_rota, vizinhos_mais_proximos
+
+# Tolerância para considerar que um movimento melhora de fato a solução
+EPSILON = 1e-9
+
+# Busca local iterada: cada perturbação remove entre RUINA_MIN e RUINA_MAX serviços próximos
+# entre si, e a nova solução é aceita se não passar do melhor custo em mais que DESVIO_ACEITACAO
+RUINA_MIN = 3
+RUINA_MAX = 20
+DESVIO_ACEITACAO = 0.01
+
+# Multipartida: o tour gigante aleatorizado sorteia cada serviço entre os TAMANHO_LRC mais
+# próximos, e uma partida abandona a busca iterada quando fica DESVIO_PODA acima do melhor
+# custo já encontrado por qualquer processo
+TAMANHO_LRC = 3
+DESVIO_PODA = 0.05
+
+# Avaliações sem melhoria guardadas para pular rotas inalteradas; acima disso o registro recomeça
+MAX_SEM_MELHORIA = 200_000
+
+# Or-opt e CROSS-exchange movem trechos de até TAMANHO_TRECHO serviços consecutivos
+TAMANHO_TRECHO = 3
+
+# Descrição leve de um movimento da busca local: as rotas só são alteradas quando
+# o movimento é aceito. delta2 é zero nos operadores intra-rota; inverter indica que
+# as arestas movidas também trocam de sentido; tamanho1/tamanho2 são os comprimentos
+# dos trechos movidos por Or-opt e CROSS-exchange.
+Movimento = namedtuple('Movimento', 'operador i j delta1 delta2 inverter tamanho1 tamanho2',
+                       defaults=(False, 1, 1))
 
 class SolucaoMelhorada:
-    def __init__(self, grafo, capacidade_veiculo):
+    def __init__(self, grafo, capacidade_veiculo, verificar_deltas=False, granularidade=None,
+                 construtor='guloso', orientar_arestas=True, semente_construcao=None,
+                 estrategia='melhor', pular_inalteradas=True, instrumentacao=None, matriz_reduzida=False):
+        # Coleta opcional de tempos e contagens (instrumentacao.Instrumentacao ou None)
+        self.instrumentacao = instrumentacao
+        self.movimentos_avaliados = 0
         self.grafo = grafo
         self.capacidade_veiculo = capacidade_veiculo
         self.deposito = int(self.grafo.info.get('Depot Node', 1))
-        self.servicos_nao_atendidos = self._inicializar_servicos()
-        self.dist_matrix, self.pred_matrix = self.grafo.floyd_warshall()
-        self.verts = sorted(self.grafo.vertices)
+        self.servicos = TabelaServicos(self.grafo)
+        self.servicos_nao_atendidos = list(range(len(self.servicos)))
+        # Com matriz_reduzida, as distâncias ficam restritas ao depósito e às extremidades
+        # dos serviços (os únicos vértices consultados) e os caminhos completos são
+        # recuperados pelo grafo sob demanda
+        self.matriz_reduzida = matriz_reduzida
+        # dist_numpy é a mesma matriz em NumPy, para operadores que avaliam muitos movimentos de uma vez
+        with self._etapa('caminhos_minimos'):
+            chaves = self.servicos.extremidades() | {self.deposito} if matriz_reduzida else None
+            self.verts, self.dist_numpy, self.dist_matrix, self.pred_matrix = \
+                self.grafo.distancias_resolvedor(chaves)
         self.index = {v: i for i, v in enumerate(self.verts)}
+        # Consultas de custo no laço principal usam só índices: dist[i][j]
+        self.dist = self.dist_matrix
+        self.deposito_idx = self.index[self.deposito]
+        self.servicos.indexar(self.index)
         self.rotas = []
         self.custo_total = 0
         self.tempo_inicio = 0
         self.tempo_fim = 0
-        
-    def _inicializar_servicos(self):
-        """Inicializa a lista de serviços não atendidos com seus IDs e informações."""
-        servicos = []
-        
-        # Adicionar vértices requeridos (ID começa em 1)
-        id_servico = 1
-        for v in sorted(self.grafo.vertices_requeridos):
-            servicos.append({
-                'id': id_servico,
-                'tipo': 'vertice',
-                'de': v,
-                'para': v,
-                'demanda': 1,
-                'custo_servico': 1
-            })
-            id_servico += 1
-        
-        # Adicionar arestas requeridas
-        for u, v, t_cost, demand, s_cost in self.grafo.arestas_requeridas:
-            servicos.append({
-                'id': id_servico,
-                'tipo': 'aresta',
-                'de': u,
-                'para': v,
-                'demanda': demand,
-                'custo_servico': s_cost
-            })
-            id_servico += 1
-        
-        # Adicionar arcos requeridos
-        for u, v, t_cost, demand, s_cost in self.grafo.arcos_requeridos:
-            servicos.append({
-                'id': id_servico,
-                'tipo': 'arco',
-                'de': u,
-                'para': v,
-                'demanda': demand,
-                'custo_servico': s_cost
-            })
-            id_servico += 1
-            
-        return servicos
+        # Instante (relativo a tempo_inicio) em que a melhor solução foi encontrada
+        self.tempo_melhor = 0
+        self._proximos_ruina = None
+        # Modo de depuração: confere cada custo obtido por delta com o recálculo completo
+        self.verificar_deltas = verificar_deltas
+        # Vizinhança granular: com granularidade k, os operadores entre rotas só colocam um
+        # serviço ao lado de um dos seus k serviços mais próximos (None = vizinhança completa)
+        self.granularidade = granularidade
+        self.vizinhos = None
+        if granularidade is not None:
+            self.vizinhos = vizinhos_mais_proximos(self.servicos, self.dist_numpy, granularidade)
+        # Construtivo da solução inicial: 'guloso' (vizinho mais próximo respeitando a
+        # capacidade) ou 'split' (tour gigante dividido de forma ótima)
+        if construtor not in ('guloso', 'split'):
+            raise ValueError(f"Construtivo desconhecido: {construtor}")
+        self.construtor = construtor
+        # Com semente_construcao, o tour gigante do construtivo split é aleatorizado
+        self.aleatorio_construcao = None
+        if semente_construcao is not None:
+            self.aleatorio_construcao = random.Random(semente_construcao)
+        # Sentido de atendimento das arestas requeridas como decisão: invertido[k] = 1 quando
+        # a aresta k é percorrida de `para` até `de`. inicio/fim guardam, já no sentido
+        # escolhido, os índices de vértice em que cada serviço começa e termina.
+        self.orientar_arestas = orientar_arestas
+        self.invertido = bytearray(len(self.servicos))
+        self.inicio = array('i', self.servicos.de_idx)
+        self.fim = array('i', self.servicos.para_idx)
+        self.reversivel = bytearray(orientar_arestas and t == ARESTA for t in self.servicos.tipo)
+        # Estratégia dos operadores: 'melhor' aplica o melhor movimento da vizinhança,
+        # 'primeira' aplica o primeiro movimento que melhora a solução
+        if estrategia not in ('melhor', 'primeira'):
+            raise ValueError(f"Estratégia desconhecida: {estrategia}")
+        self.primeira_melhoria = estrategia == 'primeira'
+        # Com pular_inalteradas, um operador que não melhorou uma rota (ou par de rotas) só
+        # volta a ser avaliado nela depois que ela mudar: (operador, versões) sem melhoria
+        self.pular_inalteradas = pular_inalteradas
+        self._sem_melhoria = set()
+    
+    def _etapa(self, nome):
+        """Bloco medido como a etapa `nome` quando há instrumentação."""
+        if self.instrumentacao is None:
+            return nullcontext()
+        return self.instrumentacao.etapa(nome)
+    
+    def _registrar_custo(self, evento):
+        """Acrescenta o custo atual à trajetória, quando há instrumentação."""
+        if self.instrumentacao is not None:
+            self.instrumentacao.custo(evento, self.custo_total)
     
     def _calcular_caminho(self, origem, destino):
         """Calcula o caminho mais curto entre dois vértices usando a matriz de predecessores."""
+        # Reconstrução completa do caminho: só é necessária para a saída; os custos
+        # consultados durante a construção e a busca local vêm direto de self.dist
         if origem == destino:
             return [origem], 0
-            
+        if self.pred_matrix is None:
+            return self.grafo.caminho(origem, destino)
+        
         i, j = self.index[origem], self.index[destino]
         if self.pred_matrix[i][j] is None:
             return None, float('inf')  # Não há caminho
-            
+        
         caminho = [destino]
         custo = self.dist_matrix[i][j]
         atual = destino
@@ -82,59 +148,54 @@ class SolucaoMelhorada:
             pred = self.pred_matrix[self.index[origem]][self.index[atual]]
             caminho.append(pred)
             atual = pred
-            
+        
         caminho.reverse()
         return caminho, custo
     
+    def _inverter(self, servico):
+        """Troca o sentido de atendimento de uma aresta requerida."""
+        self.invertido[servico] ^= 1
+        self.inicio[servico], self.fim[servico] = self.fim[servico], self.inicio[servico]
+    
     def _selecionar_proximo_servico(self, posicao_atual, capacidade_restante):
         """Seleciona o próximo serviço a ser atendido com base na proximidade e capacidade."""
-        melhor_servico = None
-        menor_distancia = float('inf')
-        
-        for servico in self.servicos_nao_atendidos:
-            # Verificar se o serviço cabe na capacidade restante
-            if servico['demanda'] > capacidade_restante:
-                continue
-                
-            # Calcular distância até o serviço
-            caminho, distancia = self._calcular_caminho(posicao_atual, servico['de'])
-            if caminho is None:
-                continue  # Não há caminho para este serviço
-                
-            if distancia < menor_distancia:
-                menor_distancia = distancia
-                melhor_servico = servico
-                
-        return melhor_servico, menor_distancia
+        # O índice devolve o não atendido mais próximo que cabe, sem varrer todos os serviços;
+        # arestas podem ser escolhidas pelo sentido contrário, que passa a valer na solução
+        servico, sentido, distancia = self.indice_proximidade.mais_proximo_orientado(
+            posicao_atual, capacidade_restante)
+        if servico is not None and sentido != self.invertido[servico]:
+            self._inverter(servico)
+        return servico, distancia
     
     def construir_solucao_inicial(self):
-        """Constrói uma solução inicial para o problema usando algoritmo construtivo guloso."""
+        """Constrói uma solução inicial para o problema (guloso ou tour gigante + Split)."""
+        tabela = self.servicos
+        
         # Ordenar serviços por proximidade ao depósito para melhorar a solução inicial
         servicos_ordenados = []
+        distancias = self.dist[self.deposito_idx]
         for servico in self.servicos_nao_atendidos:
-            caminho, distancia = self._calcular_caminho(self.deposito, servico['de'])
-            if caminho is not None:  # Garantir que há um caminho válido
+            distancia = distancias[tabela.de_idx[servico]]
+            if distancia != math.inf:  # Garantir que há um caminho válido
                 servicos_ordenados.append((servico, distancia))
         
         # Ordenar por distância e extrair apenas os serviços
         servicos_ordenados.sort(key=lambda x: x[1])
         self.servicos_nao_atendidos = [s[0] for s in servicos_ordenados]
         
-        while self.servicos_nao_atendidos:
+        # Construtivo alternativo: tour gigante dividido de forma ótima em rotas
+        if self.construtor == 'split' and self._construir_por_split():
+            return
+        
+        self.indice_proximidade = IndiceProximidade(tabela, self.dist_numpy, self.servicos_nao_atendidos,
+                                                    self.orientar_arestas)
+        
+        while self.indice_proximidade.restantes:
             # Iniciar nova rota
-            rota = {
-                'id': len(self.rotas) + 1,
-                'demanda_total': 0,
-                'custo_total': 0,
-                'visitas': [],
-                'servicos': []
-            }
+            rota = Rota(len(self.rotas) + 1)
             
             capacidade_restante = self.capacidade_veiculo
-            posicao_atual = self.deposito
-            
-            # Adicionar visita inicial ao depósito
-            rota['visitas'].append((self.deposito, self.deposito))
+            posicao_atual = self.deposito_idx
             
             while True:
                 # Selecionar próximo serviço
@@ -143,249 +204,725 @@ class SolucaoMelhorada:
                 if servico is None:
                     # Não há mais serviços que caibam nesta rota
                     break
-                    
-                # Adicionar serviço à rota
-                rota['servicos'].append(servico)
-                rota['demanda_total'] += servico['demanda']
                 
-                # Adicionar custo de deslocamento até o serviço
-                rota['custo_total'] += distancia
+                # Adicionar serviço à rota
+                rota.servicos.append(servico)
+                rota.demanda_total += tabela.demanda[servico]
                 
-                # Adicionar custo do serviço
-                rota['custo_total'] += servico['custo_servico']
+                # Adicionar custo de deslocamento até o serviço e custo do serviço
+                rota.custo_total += distancia + tabela.custo[servico]
                 
                 # Atualizar capacidade restante
-                capacidade_restante -= servico['demanda']
+                capacidade_restante -= tabela.demanda[servico]
                 
                 # Atualizar posição atual
-                posicao_atual = servico['para']
+                posicao_atual = self.fim[servico]
                 
-                # Adicionar visita ao serviço
-                rota['visitas'].append((servico['de'], servico['para']))
+                # Marcar o serviço como atendido
+                self.indice_proximidade.remover(servico)
                 
-                # Remover serviço da lista de não atendidos
-                self.servicos_nao_atendidos.remove(servico)
-                
-                if not self.servicos_nao_atendidos:
+                if not self.indice_proximidade.restantes:
                     break
             
             # Adicionar retorno ao depósito
-            caminho_retorno, distancia_retorno = self._calcular_caminho(posicao_atual, self.deposito)
-            if caminho_retorno:
-                rota['custo_total'] += distancia_retorno
-                rota['visitas'].append((self.deposito, self.deposito))
+            distancia_retorno = self.dist[posicao_atual][self.deposito_idx]
+            if distancia_retorno != math.inf:
+                rota.custo_total += distancia_retorno
+            else:
+                rota.retorna_deposito = False
             
             # Adicionar rota à solução
             self.rotas.append(rota)
-            self.custo_total += rota['custo_total']
+            self.custo_total += rota.custo_total
+    
+    def _tour_gigante(self):
+        """Sequência com todos os serviços pelo vizinho mais próximo, sem limite de capacidade.
+        
+        Com aleatorio_construcao, cada passo sorteia entre os TAMANHO_LRC mais próximos.
+        """
+        indice = IndiceProximidade(self.servicos, self.dist_numpy, self.servicos_nao_atendidos,
+                                   self.orientar_arestas)
+        tour = []
+        posicao_atual = self.deposito_idx
+        while indice.restantes:
+            if self.aleatorio_construcao is not None:
+                candidatos = indice.proximos_orientados(posicao_atual, math.inf, TAMANHO_LRC)
+                if not candidatos:
+                    return None
+                servico, sentido, _ = self.aleatorio_construcao.choice(candidatos)
+            else:
+                servico, sentido, _ = indice.mais_proximo_orientado(posicao_atual, math.inf)
+            if servico is None:
+                return None  # Restam serviços sem caminho a partir daqui
+            if sentido != self.invertido[servico]:
+                self._inverter(servico)
+            tour.append(servico)
+            indice.remover(servico)
+            posicao_atual = self.fim[servico]
+        return tour
+    
+    def _split(self, tour):
+        """Divide o tour em rotas viáveis de custo total mínimo; retorna os cortes ou None.
+        
+        Caminho mínimo no grafo auxiliar em que o arco (i, j) é a rota com as posições
+        i+1..j do tour, na versão linear com deque (frota ilimitada).
+        """
+        tabela = self.servicos
+        dist = self.dist
+        de, para = self.inicio, self.fim
+        deposito = self.deposito_idx
+        n = len(tour)
+        
+        # Prefixos de carga e de custo percorrendo o tour sem voltar ao depósito
+        carga = [0.0] * (n + 1)
+        percurso = [0.0] * (n + 1)
+        for k in range(1, n + 1):
+            servico = tour[k - 1]
+            carga[k] = carga[k - 1] + tabela.demanda[servico]
+            ligacao = dist[para[tour[k - 2]]][de[servico]] if k > 1 else 0
+            percurso[k] = percurso[k - 1] + ligacao + tabela.custo[servico]
+        
+        # Rota i+1..j custa inicio[i] + percurso[j] + volta[j]; inicio[i] só depende de i
+        potencial = [0.0] * (n + 1)
+        pai = [0] * (n + 1)
+        
+        def inicio(i):
+            servico = tour[i]
+            return potencial[i] + dist[deposito][de[servico]] + tabela.custo[servico] - percurso[i + 1]
+        
+        candidatos = deque([0])
+        for j in range(1, n + 1):
+            # Cortes que deixariam a rota acima da capacidade nunca voltam a servir
+            while candidatos and carga[j] - carga[candidatos[0]] > self.capacidade_veiculo:
+                candidatos.popleft()
+            if not candidatos:
+                return None  # Serviço com demanda maior que a capacidade
+            i = candidatos[0]
+            potencial[j] = inicio(i) + percurso[j] + dist[para[tour[j - 1]]][deposito]
+            pai[j] = i
+            if j < n:
+                # j começa rotas mais tarde que os demais: quem não for melhor que ele sai
+                inicio_j = inicio(j)
+                while candidatos and inicio(candidatos[-1]) >= inicio_j:
+                    candidatos.pop()
+                candidatos.append(j)
+        
+        if math.isinf(potencial[n]):
+            return None
+        cortes = []
+        j = n
+        while j > 0:
+            cortes.append((pai[j], j))
+            j = pai[j]
+        cortes.reverse()
+        return cortes
+    
+    def _construir_por_split(self):
+        """Constrói as rotas pelo tour gigante + Split; retorna False se não for possível."""
+        tour = self._tour_gigante()
+        cortes = self._split(tour) if tour else None
+        if cortes is None:
+            return False
+        
+        for i, j in cortes:
+            rota = Rota(len(self.rotas) + 1, tour[i:j])
+            rota.demanda_total = sum(self.servicos.demanda[s] for s in rota.servicos)
+            rota.custo_total = self._calcular_custo_rota(rota)
+            self.rotas.append(rota)
+            self.custo_total += rota.custo_total
+        return True
     
     def _calcular_custo_rota(self, rota):
         """Calcula o custo total de uma rota."""
+        tabela = self.servicos
+        dist = self.dist
         custo = 0
-        posicao_atual = self.deposito
+        posicao_atual = self.deposito_idx
         
         # Para cada serviço na rota
-        for servico in rota['servicos']:
+        for servico in rota.servicos:
             # Custo de deslocamento até o serviço
-            _, distancia = self._calcular_caminho(posicao_atual, servico['de'])
-            custo += distancia
+            custo += dist[posicao_atual][self.inicio[servico]]
             
             # Custo do serviço
-            custo += servico['custo_servico']
+            custo += tabela.custo[servico]
             
             # Atualizar posição atual
-            posicao_atual = servico['para']
+            posicao_atual = self.fim[servico]
         
         # Adicionar retorno ao depósito
-        _, distancia_retorno = self._calcular_caminho(posicao_atual, self.deposito)
-        custo += distancia_retorno
+        custo += dist[posicao_atual][self.deposito_idx]
         
         return custo
     
-    def _reconstruir_visitas_rota(self, rota):
-        """Reconstrói as visitas de uma rota com base nos serviços."""
-        visitas = [(self.deposito, self.deposito)]  # Visita inicial ao depósito
-        
-        for servico in rota['servicos']:
-            visitas.append((servico['de'], servico['para']))
-        
-        visitas.append((self.deposito, self.deposito))  # Visita final ao depósito
-        
-        return visitas
+    def _saida(self, servicos, k):
+        """Índice do vértice em que o veículo está antes de atender a posição k da rota."""
+        return self.fim[servicos[k - 1]] if k > 0 else self.deposito_idx
+    
+    def _chegada(self, servicos, k):
+        """Índice do vértice em que começa a posição k da rota (depósito após o último serviço)."""
+        return self.inicio[servicos[k]] if k < len(servicos) else self.deposito_idx
+    
+    def _conferir_custo_rota(self, rota):
+        """No modo de depuração, confere o custo obtido por delta com o recálculo completo."""
+        if self.verificar_deltas:
+            custo_completo = self._calcular_custo_rota(rota)
+            assert abs(custo_completo - rota.custo_total) <= 1e-6, \
+                f"Delta inconsistente na rota {rota.id}: {rota.custo_total} != {custo_completo}"
+    
+    def _rota_alcancavel(self, rota):
+        """Indica se todos os deslocamentos da rota existem no grafo (custo completo finito)."""
+        # Rotas sem caminho de volta ao depósito só têm custo finito registrado porque o
+        # construtivo ignora o retorno impossível; os deltas não se aplicam a elas
+        return not math.isinf(self._calcular_custo_rota(rota))
     
     def _aplicar_2opt_intra_rota(self, rota):
         """Aplica o algoritmo 2-opt para melhorar uma rota."""
-        if len(rota['servicos']) < 2:
-            return rota, False
+        servicos = rota.servicos
+        if len(servicos) < 2 or not self._rota_alcancavel(rota):
+            return False
         
-        melhor_rota = copy.deepcopy(rota)
-        melhoria_encontrada = False
+        dist = self.dist
+        de, para = self.inicio, self.fim
+        reversivel = self.reversivel
+        melhor_delta = -EPSILON
+        melhor_movimento = None
+        avaliados = 0
         
-        for i in range(len(rota['servicos']) - 1):
-            for j in range(i + 1, len(rota['servicos'])):
-                # Criar uma nova rota com os serviços invertidos entre i e j
-                nova_rota = copy.deepcopy(rota)
-                nova_rota['servicos'][i:j+1] = reversed(nova_rota['servicos'][i:j+1])
+        for i in range(len(servicos) - 1):
+            anterior = self._saida(servicos, i)
+            # Custos das ligações internas do trecho i..j, no sentido original e invertido,
+            # acumulados conforme j avança
+            interno_original = 0
+            interno_invertido = 0
+            # Trecho invertido e com as arestas também em sentido contrário: só vale enquanto
+            # o trecho não tem arcos (vértices requeridos não têm sentido)
+            interno_espelhado = 0
+            espelhavel = self.orientar_arestas and (reversivel[servicos[i]] or de[servicos[i]] == para[servicos[i]])
+            for j in range(i + 1, len(servicos)):
+                interno_original += dist[para[servicos[j - 1]]][de[servicos[j]]]
+                interno_invertido += dist[para[servicos[j]]][de[servicos[j - 1]]]
+                seguinte = self._chegada(servicos, j + 1)
+                avaliados += 1
                 
-                # Recalcular o custo da nova rota
-                nova_rota['custo_total'] = self._calcular_custo_rota(nova_rota)
+                delta = (dist[anterior][de[servicos[j]]] + interno_invertido
+                         + dist[para[servicos[i]]][seguinte]
+                         - dist[anterior][de[servicos[i]]] - interno_original
+                         - dist[para[servicos[j]]][seguinte])
                 
-                # Se a nova rota for melhor, atualizar a melhor rota
-                if nova_rota['custo_total'] < melhor_rota['custo_total']:
-                    melhor_rota = nova_rota
-                    melhoria_encontrada = True
+                if delta < melhor_delta:
+                    melhor_delta = delta
+                    melhor_movimento = Movimento('2opt', i, j, delta, 0)
+                    if self.primeira_melhoria:
+                        return self._concluir(melhor_movimento, avaliados, rota)
+                
+                if espelhavel:
+                    servico = servicos[j]
+                    espelhavel = reversivel[servico] or de[servico] == para[servico]
+                if espelhavel:
+                    interno_espelhado += dist[de[servicos[j]]][para[servicos[j - 1]]]
+                    avaliados += 1
+                    delta = (dist[anterior][para[servicos[j]]] + interno_espelhado
+                             + dist[de[servicos[i]]][seguinte]
+                             - dist[anterior][de[servicos[i]]] - interno_original
+                             - dist[para[servicos[j]]][seguinte])
+                    
+                    if delta < melhor_delta:
+                        melhor_delta = delta
+                        melhor_movimento = Movimento('2opt', i, j, delta, 0, True)
+                        if self.primeira_melhoria:
+                            return self._concluir(melhor_movimento, avaliados, rota)
+        
+        return self._concluir(melhor_movimento, avaliados, rota)
+    
+    def _aplicar_orientacao_rota(self, rota):
+        """Escolhe o sentido ótimo de todas as arestas da rota, mantida a ordem dos serviços.
+        
+        Programação dinâmica com dois estados por posição (sentido atual ou invertido).
+        """
+        servicos = rota.servicos
+        if not self.orientar_arestas or not servicos:
+            return False
+        custo_servicos = sum(self.servicos.custo[s] for s in servicos)
+        # Deslocamento com todos os sentidos mantidos
+        atual = self._calcular_custo_rota(rota) - custo_servicos
+        if math.isinf(atual):
+            return False
+        self.movimentos_avaliados += 1  # A programação dinâmica conta como uma avaliação
         
-        # Se houve melhoria, reconstruir as visitas da rota
-        if melhoria_encontrada:
-            melhor_rota['visitas'] = self._reconstruir_visitas_rota(melhor_rota)
+        dist = self.dist
+        inicio, fim, reversivel = self.inicio, self.fim, self.reversivel
+        deposito = self.deposito_idx
+        # custo[s]: melhor deslocamento até terminar o serviço atual no sentido s
+        # (0 = sentido atual, 1 = invertido); escolhas[k][s]: sentido do serviço anterior
+        custo = (0.0, math.inf)
+        saidas = (deposito, deposito)
+        escolhas = []
+        for servico in servicos:
+            a, b = inicio[servico], fim[servico]
+            opcoes = ((a, b), (b, a)) if reversivel[servico] else ((a, b),)
+            novo_custo = [math.inf, math.inf]
+            nova_escolha = [0, 0]
+            for sentido, (entrada, _) in enumerate(opcoes):
+                for anterior in (0, 1):
+                    valor = custo[anterior] + dist[saidas[anterior]][entrada]
+                    if valor < novo_custo[sentido]:
+                        novo_custo[sentido] = valor
+                        nova_escolha[sentido] = anterior
+            escolhas.append(nova_escolha)
+            custo = tuple(novo_custo)
+            saidas = (b, a)
+        
+        finais = [custo[sentido] + dist[saidas[sentido]][deposito] for sentido in (0, 1)]
+        sentido = 0 if finais[0] <= finais[1] else 1
+        melhor = finais[sentido]
+        if melhor - atual >= -EPSILON:
+            return False
+        
+        for k in range(len(servicos) - 1, -1, -1):
+            anterior = escolhas[k][sentido]
+            if sentido:
+                self._inverter(servicos[k])
+            sentido = anterior
+        rota.custo_total = melhor + custo_servicos
+        rota.retorna_deposito = True
+        rota.alterada()
+        self._conferir_custo_rota(rota)
+        return True
+    
+    def _delta_remocao(self, servicos, i):
+        """Variação de deslocamento ao retirar o serviço da posição i."""
+        anterior = self._saida(servicos, i)
+        seguinte = self._chegada(servicos, i + 1)
+        servico = servicos[i]
+        dist = self.dist
+        return (dist[anterior][seguinte]
+                - dist[anterior][self.inicio[servico]]
+                - dist[self.fim[servico]][seguinte])
+    
+    def _delta_insercao(self, servicos, j, servico, invertido=False):
+        """Variação de deslocamento ao inserir um serviço antes da posição j.
         
-        return melhor_rota, melhoria_encontrada
+        Com `invertido`, avalia a inserção no sentido contrário ao atual.
+        """
+        anterior = self._saida(servicos, j)
+        seguinte = self._chegada(servicos, j)
+        inicio, fim = self.inicio[servico], self.fim[servico]
+        if invertido:
+            inicio, fim = fim, inicio
+        dist = self.dist
+        return dist[anterior][inicio] + dist[fim][seguinte] - dist[anterior][seguinte]
+    
+    def _melhor_insercao(self, servicos, j, servico):
+        """Menor variação de inserção antes da posição j, considerando os dois sentidos."""
+        delta = self._delta_insercao(servicos, j, servico)
+        if self.reversivel[servico]:
+            delta_invertido = self._delta_insercao(servicos, j, servico, True)
+            if delta_invertido < delta:
+                return delta_invertido, True
+        return delta, False
     
     def _aplicar_realocacao_intra_rota(self, rota):
         """Aplica o operador de realocação para melhorar uma rota."""
-        if len(rota['servicos']) < 2:
-            return rota, False
+        servicos = rota.servicos
+        if len(servicos) < 2 or not self._rota_alcancavel(rota):
+            return False
         
-        melhor_rota = copy.deepcopy(rota)
-        melhoria_encontrada = False
+        melhor_delta = -EPSILON
+        melhor_movimento = None
+        avaliados = 0
         
-        for i in range(len(rota['servicos'])):
-            servico_removido = rota['servicos'][i]
+        for i in range(len(servicos)):
+            servico_removido = servicos[i]
+            delta_remocao = self._delta_remocao(servicos, i)
             
-            for j in range(len(rota['servicos']) + 1):
+            for j in range(len(servicos) + 1):
                 if j == i or j == i + 1:
                     continue  # Mesma posição ou posição adjacente
                 
-                # Criar uma nova rota com o serviço realocado
-                nova_rota = copy.deepcopy(rota)
-                nova_rota['servicos'].pop(i)
-                
-                if j > i:
-                    j -= 1  # Ajustar índice após remoção
-                
-                nova_rota['servicos'].insert(j, servico_removido)
+                avaliados += 1
+                # Os vizinhos da posição j não incluem o serviço removido
+                delta_insercao, inverter = self._melhor_insercao(servicos, j, servico_removido)
+                delta = delta_remocao + delta_insercao
                 
-                # Recalcular o custo da nova rota
-                nova_rota['custo_total'] = self._calcular_custo_rota(nova_rota)
+                if delta < melhor_delta:
+                    melhor_delta = delta
+                    melhor_movimento = Movimento('realocacao_intra', i, j, delta, 0, inverter)
+                    if self.primeira_melhoria:
+                        return self._concluir(melhor_movimento, avaliados, rota)
+        
+        return self._concluir(melhor_movimento, avaliados, rota)
+    
+    def _aplicar_oropt_intra_rota(self, rota):
+        """Or-opt: move um trecho de 2 a TAMANHO_TRECHO serviços para outra posição da rota.
+        
+        Trechos de um serviço já são cobertos pela realocação. O custo interno do trecho não
+        muda, então cada movimento é avaliado em O(1) pelas ligações das pontas.
+        """
+        servicos = rota.servicos
+        n = len(servicos)
+        if n < 3 or not self._rota_alcancavel(rota):
+            return False
+        
+        dist = self.dist
+        melhor_delta = -EPSILON
+        melhor_movimento = None
+        avaliados = 0
+        
+        for tamanho in range(2, min(TAMANHO_TRECHO, n - 1) + 1):
+            for i in range(n - tamanho + 1):
+                fim_trecho = i + tamanho
+                primeiro = self.inicio[servicos[i]]
+                ultimo = self.fim[servicos[fim_trecho - 1]]
+                anterior = self._saida(servicos, i)
+                seguinte = self._chegada(servicos, fim_trecho)
+                delta_remocao = dist[anterior][seguinte] - dist[anterior][primeiro] - dist[ultimo][seguinte]
                 
-                # Se a nova rota for melhor, atualizar a melhor rota
-                if nova_rota['custo_total'] < melhor_rota['custo_total']:
-                    melhor_rota = nova_rota
-                    melhoria_encontrada = True
+                for j in range(n + 1):
+                    if i <= j <= fim_trecho:
+                        continue  # Dentro do trecho ou na mesma posição
+                    avaliados += 1
+                    # Fora do trecho, os vizinhos da posição j não mudam com a remoção
+                    antes = self._saida(servicos, j)
+                    depois = self._chegada(servicos, j)
+                    delta = delta_remocao + dist[antes][primeiro] + dist[ultimo][depois] - dist[antes][depois]
+                    
+                    if delta < melhor_delta:
+                        melhor_delta = delta
+                        melhor_movimento = Movimento('oropt', i, j, delta, 0, False, tamanho)
+                        if self.primeira_melhoria:
+                            return self._concluir(melhor_movimento, avaliados, rota)
+        
+        return self._concluir(melhor_movimento, avaliados, rota)
+    
+    def _trechos(self, rota):
+        """Trechos de 0 a TAMANHO_TRECHO serviços da rota, em colunas NumPy calculadas por prefixos.
+        
+        Para cada trecho: posição inicial, tamanho, carga, custo (serviços e deslocamentos
+        internos), vértices em que começa e termina, vértices da rota antes e depois dele e
+        o custo atual da ligação de um ao outro passando pelo trecho. O trecho vazio na
+        posição i representa um ponto de inserção (começo e fim valem 0 e não são usados).
+        """
+        servicos = rota.servicos
+        tabela = self.servicos
+        dist = self.dist
+        n = len(servicos)
+        # carga[k] e custo[k]: demanda e custo (com o deslocamento até cada serviço) das k primeiras posições
+        carga = [0.0] * (n + 1)
+        custo = [0] * (n + 1)
+        chegadas = [0] * n  # deslocamento até a posição k
+        for k, servico in enumerate(servicos):
+            chegadas[k] = dist[self._saida(servicos, k)][self.inicio[servico]]
+            carga[k + 1] = carga[k] + tabela.demanda[servico]
+            custo[k + 1] = custo[k] + chegadas[k] + tabela.custo[servico]
+        
+        trechos = []
+        for i in range(n + 1):
+            anterior = self._saida(servicos, i)
+            seguinte = self._chegada(servicos, i)
+            trechos.append((i, 0, 0.0, 0, 0, 0, anterior, seguinte, dist[anterior][seguinte]))
+            for tamanho in range(1, min(TAMANHO_TRECHO, n - i) + 1):
+                fim_trecho = i + tamanho
+                seguinte = self._chegada(servicos, fim_trecho)
+                ultimo = self.fim[servicos[fim_trecho - 1]]
+                custo_trecho = custo[fim_trecho] - custo[i] - chegadas[i]
+                trechos.append((i, tamanho, carga[fim_trecho] - carga[i], custo_trecho,
+                                self.inicio[servicos[i]], ultimo, anterior, seguinte,
+                                chegadas[i] + custo_trecho + dist[ultimo][seguinte]))
+        colunas = list(zip(*trechos))
+        inteiros = [np.array(colunas[k], dtype=np.int64) for k in (0, 1, 4, 5, 6, 7)]
+        reais = [np.array(colunas[k], dtype=np.float64) for k in (2, 3, 8)]
+        posicao, tamanho, primeiro, ultimo, anterior, seguinte = inteiros
+        carga, custo, ligacao = reais
+        return posicao, tamanho, carga, custo, primeiro, ultimo, anterior, seguinte, ligacao
+    
+    def _pares_trechos_granulares(self, servicos1, servicos2):
+        """Na vizinhança granular, pares (i, j) de inícios de trecho que criam uma ligação
+        entre vizinhos próximos: o trecho de uma rota passa a seguir o serviço que antecedia
+        o trecho da outra."""
+        posicoes1 = self._posicoes_na_rota(servicos1)
+        posicoes2 = self._posicoes_na_rota(servicos2)
+        pares = set()
+        for i, servico in enumerate(servicos1):
+            for vizinho in self.vizinhos[servico]:
+                p = posicoes2.get(vizinho)
+                if p is not None:
+                    pares.add((i, p + 1))
+        for j, servico in enumerate(servicos2):
+            for vizinho in self.vizinhos[servico]:
+                p = posicoes1.get(vizinho)
+                if p is not None:
+                    pares.add((p + 1, j))
+        return pares
+    
+    def _aplicar_cross_entre_rotas(self, rota1, rota2):
+        """CROSS-exchange: troca trechos de 0 a TAMANHO_TRECHO serviços entre duas rotas.
         
-        # Se houve melhoria, reconstruir as visitas da rota
-        if melhoria_encontrada:
-            melhor_rota['visitas'] = self._reconstruir_visitas_rota(melhor_rota)
+        Com um trecho vazio, o outro é só transferido (Or-opt entre rotas). Os pares já
+        cobertos pela troca e pela realocação (um serviço de cada lado, ou um só serviço
+        transferido) são pulados. Cargas e custos dos trechos vêm de prefixos das rotas, então
+        cada par custa O(1); os pares de duas rotas são avaliados juntos em matrizes NumPy,
+        na mesma ordem (trechos da rota 1 por fora) e com as mesmas contas de um laço.
+        """
+        if not self._rota_alcancavel(rota1) or not self._rota_alcancavel(rota2):
+            return False
         
-        return melhor_rota, melhoria_encontrada
+        dist = self.dist_numpy
+        i1, tamanho1, carga1, custo1, primeiro1, ultimo1, anterior1, seguinte1, ligacao1 = self._trechos(rota1)
+        i2, tamanho2, carga2, custo2, primeiro2, ultimo2, anterior2, seguinte2, ligacao2 = self._trechos(rota2)
+        coluna = (slice(None), None)  # trechos da rota 1 nas linhas, da rota 2 nas colunas
+        
+        # Rota 1 recebe o trecho 2 no lugar do trecho 1, e vice-versa
+        delta1 = np.where(tamanho2 > 0,
+                          dist[anterior1[coluna], primeiro2] + custo2 + dist[ultimo2, seguinte1[coluna]],
+                          dist[anterior1, seguinte1][coluna]) - ligacao1[coluna]
+        delta2 = np.where(tamanho1[coluna] > 0,
+                          dist[anterior2, primeiro1[coluna]] + custo1[coluna] + dist[ultimo1[coluna], seguinte2],
+                          dist[anterior2, seguinte2]) - ligacao2
+        delta = delta1 + delta2
+        
+        # Nada a mover, troca simples ou realocação simples
+        validos = (tamanho1[coluna] > 1) | (tamanho2 > 1)
+        validos &= carga2 - carga1[coluna] <= self.capacidade_veiculo - rota1.demanda_total
+        validos &= carga1[coluna] - carga2 <= self.capacidade_veiculo - rota2.demanda_total
+        if self.vizinhos is not None:
+            pares = self._pares_trechos_granulares(rota1.servicos, rota2.servicos)
+            granulares = np.zeros((len(rota1.servicos) + 1, len(rota2.servicos) + 1), dtype=bool)
+            if pares:
+                linhas, colunas = zip(*pares)
+                granulares[linhas, colunas] = True
+            validos &= granulares[i1[coluna], i2]
+        avaliados = int(np.count_nonzero(validos))
+        melhoras = np.flatnonzero(validos & (delta < -EPSILON))
+        if melhoras.size == 0:
+            return self._concluir(None, avaliados, rota1, rota2)
+        
+        # Primeira melhoria: o primeiro par na ordem de varredura; melhor: o primeiro de menor delta
+        if self.primeira_melhoria:
+            escolhido = melhoras[0]
+        else:
+            escolhido = melhoras[np.argmin(delta.flat[melhoras])]
+        a, b = divmod(int(escolhido), len(i2))
+        movimento = Movimento('cross', int(i1[a]), int(i2[b]), float(delta1[a, b]), float(delta2[a, b]),
+                              False, int(tamanho1[a]), int(tamanho2[b]))
+        return self._concluir(movimento, avaliados, rota1, rota2)
+    
+    def _delta_substituicao(self, servicos, i, novo):
+        """Variação de custo ao trocar o serviço da posição i por outro."""
+        tabela = self.servicos
+        anterior = self._saida(servicos, i)
+        seguinte = self._chegada(servicos, i + 1)
+        antigo = servicos[i]
+        dist = self.dist
+        return (dist[anterior][self.inicio[novo]] + dist[self.fim[novo]][seguinte]
+                - dist[anterior][self.inicio[antigo]] - dist[self.fim[antigo]][seguinte]
+                + tabela.custo[novo] - tabela.custo[antigo])
     
-    def _verificar_capacidade_rota(self, rota):
-        """Verifica se a rota respeita a restrição de capacidade."""
-        demanda_total = sum(servico['demanda'] for servico in rota['servicos'])
-        return demanda_total <= self.capacidade_veiculo
+    def _posicoes_na_rota(self, servicos):
+        """Mapeia serviço -> posição na rota, usado apenas na vizinhança granular."""
+        if self.vizinhos is None:
+            return None
+        return {servico: j for j, servico in enumerate(servicos)}
+    
+    def _posicoes_insercao(self, servico, servicos, posicoes):
+        """Posições da rota em que vale a pena inserir o serviço."""
+        if posicoes is None:
+            return range(len(servicos) + 1)
+        # Antes ou depois de cada vizinho próximo presente na rota
+        candidatas = []
+        for vizinho in self.vizinhos[servico]:
+            p = posicoes.get(vizinho)
+            if p is not None:
+                candidatas += (p, p + 1)
+        return candidatas
+    
+    def _posicoes_troca(self, servico, servicos, posicoes):
+        """Posições da rota cujo serviço vale a pena trocar pelo serviço dado."""
+        if posicoes is None:
+            return range(len(servicos))
+        # Trocas que deixam o serviço logo antes ou logo depois de um vizinho próximo
+        candidatas = []
+        for vizinho in self.vizinhos[servico]:
+            p = posicoes.get(vizinho)
+            if p is not None:
+                if p > 0:
+                    candidatas.append(p - 1)
+                if p + 1 < len(servicos):
+                    candidatas.append(p + 1)
+        return candidatas
     
     def _aplicar_troca_entre_rotas(self, rota1, rota2):
         """Aplica o operador de troca entre duas rotas."""
-        if not rota1['servicos'] or not rota2['servicos']:
-            return rota1, rota2, False
-        
-        melhor_rota1 = copy.deepcopy(rota1)
-        melhor_rota2 = copy.deepcopy(rota2)
-        custo_atual = rota1['custo_total'] + rota2['custo_total']
-        melhoria_encontrada = False
-        
-        for i in range(len(rota1['servicos'])):
-            for j in range(len(rota2['servicos'])):
-                # Criar novas rotas com os serviços trocados
-                nova_rota1 = copy.deepcopy(rota1)
-                nova_rota2 = copy.deepcopy(rota2)
-                
-                servico1 = nova_rota1['servicos'][i]
-                servico2 = nova_rota2['servicos'][j]
-                
-                nova_rota1['servicos'][i] = servico2
-                nova_rota2['servicos'][j] = servico1
+        if not rota1.servicos or not rota2.servicos:
+            return False
+        if not self._rota_alcancavel(rota1) or not self._rota_alcancavel(rota2):
+            return False
+        
+        servicos1 = rota1.servicos
+        servicos2 = rota2.servicos
+        demanda = self.servicos.demanda
+        folga1 = self.capacidade_veiculo - rota1.demanda_total
+        folga2 = self.capacidade_veiculo - rota2.demanda_total
+        posicoes2 = self._posicoes_na_rota(servicos2)
+        melhor_delta = -EPSILON
+        melhor_movimento = None
+        avaliados = 0
+        
+        for i in range(len(servicos1)):
+            servico1 = servicos1[i]
+            for j in self._posicoes_troca(servico1, servicos2, posicoes2):
+                servico2 = servicos2[j]
                 
                 # Verificar se as novas rotas respeitam a restrição de capacidade
-                if not self._verificar_capacidade_rota(nova_rota1) or not self._verificar_capacidade_rota(nova_rota2):
+                diferenca = demanda[servico2] - demanda[servico1]
+                if diferenca > folga1 or -diferenca > folga2:
                     continue
+                avaliados += 1
                 
-                # Recalcular os custos das novas rotas
-                nova_rota1['custo_total'] = self._calcular_custo_rota(nova_rota1)
-                nova_rota2['custo_total'] = self._calcular_custo_rota(nova_rota2)
-                
-                novo_custo = nova_rota1['custo_total'] + nova_rota2['custo_total']
+                delta1 = self._delta_substituicao(servicos1, i, servico2)
+                delta2 = self._delta_substituicao(servicos2, j, servico1)
                 
-                # Se as novas rotas forem melhores, atualizar as melhores rotas
-                if novo_custo < custo_atual:
-                    melhor_rota1 = nova_rota1
-                    melhor_rota2 = nova_rota2
-                    custo_atual = novo_custo
-                    melhoria_encontrada = True
-        
-        # Se houve melhoria, reconstruir as visitas das rotas
-        if melhoria_encontrada:
-            melhor_rota1['visitas'] = self._reconstruir_visitas_rota(melhor_rota1)
-            melhor_rota2['visitas'] = self._reconstruir_visitas_rota(melhor_rota2)
-            
-            # Recalcular demanda total
-            melhor_rota1['demanda_total'] = sum(servico['demanda'] for servico in melhor_rota1['servicos'])
-            melhor_rota2['demanda_total'] = sum(servico['demanda'] for servico in melhor_rota2['servicos'])
+                if delta1 + delta2 < melhor_delta:
+                    melhor_delta = delta1 + delta2
+                    melhor_movimento = Movimento('troca', i, j, delta1, delta2)
+                    if self.primeira_melhoria:
+                        return self._concluir(melhor_movimento, avaliados, rota1, rota2)
         
-        return melhor_rota1, melhor_rota2, melhoria_encontrada
+        return self._concluir(melhor_movimento, avaliados, rota1, rota2)
     
     def _aplicar_realocacao_entre_rotas(self, rota1, rota2):
         """Aplica o operador de realocação entre duas rotas."""
-        if not rota1['servicos']:
-            return rota1, rota2, False
+        if not rota1.servicos:
+            return False
+        if not self._rota_alcancavel(rota1) or not self._rota_alcancavel(rota2):
+            return False
         
-        melhor_rota1 = copy.deepcopy(rota1)
-        melhor_rota2 = copy.deepcopy(rota2)
-        custo_atual = rota1['custo_total'] + rota2['custo_total']
-        melhoria_encontrada = False
+        servicos1 = rota1.servicos
+        servicos2 = rota2.servicos
+        tabela = self.servicos
+        posicoes2 = self._posicoes_na_rota(servicos2)
+        melhor_delta = -EPSILON
+        melhor_movimento = None
+        avaliados = 0
         
-        for i in range(len(rota1['servicos'])):
-            servico = rota1['servicos'][i]
+        for i in range(len(servicos1)):
+            servico = servicos1[i]
             
             # Verificar se o serviço cabe na rota2
-            nova_demanda_rota2 = rota2['demanda_total'] + servico['demanda']
+            nova_demanda_rota2 = rota2.demanda_total + tabela.demanda[servico]
             if nova_demanda_rota2 > self.capacidade_veiculo:
                 continue
             
-            for j in range(len(rota2['servicos']) + 1):
-                # Criar novas rotas com o serviço realocado
-                nova_rota1 = copy.deepcopy(rota1)
-                nova_rota2 = copy.deepcopy(rota2)
-                
-                # Remover o serviço da rota1
-                servico_removido = nova_rota1['servicos'].pop(i)
-                
-                # Inserir o serviço na rota2
-                nova_rota2['servicos'].insert(j, servico_removido)
-                
-                # Recalcular os custos das novas rotas
-                nova_rota1['custo_total'] = self._calcular_custo_rota(nova_rota1)
-                nova_rota2['custo_total'] = self._calcular_custo_rota(nova_rota2)
-                
-                novo_custo = nova_rota1['custo_total'] + nova_rota2['custo_total']
-                
-                # Se as novas rotas forem melhores, atualizar as melhores rotas
-                if novo_custo < custo_atual:
-                    melhor_rota1 = nova_rota1
-                    melhor_rota2 = nova_rota2
-                    custo_atual = novo_custo
-                    melhoria_encontrada = True
-        
-        # Se houve melhoria, reconstruir as visitas das rotas
-        if melhoria_encontrada:
-            melhor_rota1['visitas'] = self._reconstruir_visitas_rota(melhor_rota1)
-            melhor_rota2['visitas'] = self._reconstruir_visitas_rota(melhor_rota2)
+            delta1 = self._delta_remocao(servicos1, i) - tabela.custo[servico]
             
-            # Recalcular demanda total
-            melhor_rota1['demanda_total'] = sum(servico['demanda'] for servico in melhor_rota1['servicos'])
-            melhor_rota2['demanda_total'] = sum(servico['demanda'] for servico in melhor_rota2['servicos'])
+            for j in self._posicoes_insercao(servico, servicos2, posicoes2):
+                avaliados += 1
+                delta_insercao, inverter = self._melhor_insercao(servicos2, j, servico)
+                delta2 = delta_insercao + tabela.custo[servico]
+                
+                if delta1 + delta2 < melhor_delta:
+                    melhor_delta = delta1 + delta2
+                    melhor_movimento = Movimento('realocacao_entre', i, j, delta1, delta2, inverter)
+                    if self.primeira_melhoria:
+                        return self._concluir(melhor_movimento, avaliados, rota1, rota2)
+        
+        return self._concluir(melhor_movimento, avaliados, rota1, rota2)
+    
+    def _concluir(self, movimento, avaliados, rota1, rota2=None):
+        """Fim comum dos operadores: contabiliza as avaliações e aplica o movimento escolhido."""
+        self.movimentos_avaliados += avaliados
+        if movimento is None:
+            return False
+        self._executar_movimento(movimento, rota1, rota2)
+        return True
+    
+    def _executar_movimento(self, movimento, rota1, rota2=None):
+        """Aplica no lugar um movimento aceito, sem copiar as rotas."""
+        operador, i, j, delta1, delta2, inverter, tamanho1, tamanho2 = movimento
+        servicos1 = rota1.servicos
+        demanda = self.servicos.demanda
+        
+        if operador == '2opt':
+            servicos1[i:j+1] = reversed(servicos1[i:j+1])
+            if inverter:
+                for servico in servicos1[i:j+1]:
+                    if self.reversivel[servico]:
+                        self._inverter(servico)
+        elif operador == 'realocacao_intra':
+            servico = servicos1.pop(i)
+            if j > i:
+                j -= 1  # Ajustar índice após remoção
+            servicos1.insert(j, servico)
+            if inverter:
+                self._inverter(servico)
+        elif operador == 'oropt':
+            trecho = servicos1[i:i+tamanho1]
+            del servicos1[i:i+tamanho1]
+            if j > i:
+                j -= tamanho1  # Ajustar índice após remoção
+            servicos1[j:j] = trecho
+        elif operador == 'cross':
+            servicos2 = rota2.servicos
+            trecho1 = servicos1[i:i+tamanho1]
+            trecho2 = servicos2[j:j+tamanho2]
+            servicos1[i:i+tamanho1] = trecho2
+            servicos2[j:j+tamanho2] = trecho1
+            diferenca = sum(demanda[s] for s in trecho2) - sum(demanda[s] for s in trecho1)
+            rota1.demanda_total += diferenca
+            rota2.demanda_total -= diferenca
+        elif operador == 'troca':
+            servicos2 = rota2.servicos
+            servico1, servico2 = servicos1[i], servicos2[j]
+            servicos1[i], servicos2[j] = servico2, servico1
+            rota1.demanda_total += demanda[servico2] - demanda[servico1]
+            rota2.demanda_total += demanda[servico1] - demanda[servico2]
+        elif operador == 'realocacao_entre':
+            servico = servicos1.pop(i)
+            rota2.servicos.insert(j, servico)
+            if inverter:
+                self._inverter(servico)
+            rota1.demanda_total -= demanda[servico]
+            rota2.demanda_total += demanda[servico]
+        else:
+            raise ValueError(f"Operador desconhecido: {operador}")
         
-        return melhor_rota1, melhor_rota2, melhoria_encontrada
+        for rota, delta in ((rota1, delta1), (rota2, delta2)):
+            if rota is None:
+                continue
+            rota.custo_total += delta
+            rota.retorna_deposito = True
+            rota.alterada()
+            self._conferir_custo_rota(rota)
+    
+    def _avaliar(self, operador, rota1, rota2=None):
+        """Aplica o operador, a menos que ele já tenha falhado nas mesmas versões das rotas.
+        
+        Os operadores são determinísticos e só dependem das rotas avaliadas, então pular
+        essas avaliações não muda o resultado: cada passada só reexamina as rotas alteradas.
+        """
+        if self.pular_inalteradas:
+            chave = (operador.__name__, rota1.versao, rota2.versao if rota2 is not None else 0)
+            if chave in self._sem_melhoria:
+                if self.instrumentacao is not None:
+                    self.instrumentacao.pulado(operador.__name__.replace('_aplicar_', ''))
+                return False
+        
+        if self.instrumentacao is None:
+            melhorou = operador(rota1) if rota2 is None else operador(rota1, rota2)
+        else:
+            avaliados = self.movimentos_avaliados
+            inicio = time.perf_counter_ns()
+            melhorou = operador(rota1) if rota2 is None else operador(rota1, rota2)
+            self.instrumentacao.operador(operador.__name__.replace('_aplicar_', ''),
+                                         self.movimentos_avaliados - avaliados, melhorou,
+                                         time.perf_counter_ns() - inicio)
+        
+        if melhorou or not self.pular_inalteradas:
+            return melhorou
+        if len(self._sem_melhoria) >= MAX_SEM_MELHORIA:
+            self._sem_melhoria.clear()
+        self._sem_melhoria.add(chave)
+        return False
     
     def _aplicar_busca_local_intra_rota(self):
         """Aplica busca local dentro de cada rota."""
@@ -393,12 +930,18 @@ class SolucaoMelhorada:
         
         for i in range(len(self.rotas)):
             # Aplicar 2-opt
-            self.rotas[i], melhoria_2opt = self._aplicar_2opt_intra_rota(self.rotas[i])
+            melhoria_2opt = self._avaliar(self._aplicar_2opt_intra_rota, self.rotas[i])
+            
+            # Reorientar as arestas da rota
+            melhoria_orientacao = self._avaliar(self._aplicar_orientacao_rota, self.rotas[i])
             
             # Aplicar realocação
-            self.rotas[i], melhoria_realocacao = self._aplicar_realocacao_intra_rota(self.rotas[i])
+            melhoria_realocacao = self._avaliar(self._aplicar_realocacao_intra_rota, self.rotas[i])
             
-            if melhoria_2opt or melhoria_realocacao:
+            # Mover trechos de serviços consecutivos
+            melhoria_oropt = self._avaliar(self._aplicar_oropt_intra_rota, self.rotas[i])
+            
+            if melhoria_2opt or melhoria_orientacao or melhoria_realocacao or melhoria_oropt:
                 melhoria_global = True
         
         return melhoria_global
@@ -410,29 +953,54 @@ class SolucaoMelhorada:
         for i in range(len(self.rotas)):
             for j in range(i + 1, len(self.rotas)):
                 # Aplicar troca entre rotas
-                self.rotas[i], self.rotas[j], melhoria_troca = self._aplicar_troca_entre_rotas(self.rotas[i], self.rotas[j])
+                melhoria_troca = self._avaliar(self._aplicar_troca_entre_rotas, self.rotas[i], self.rotas[j])
                 
                 # Aplicar realocação entre rotas
-                self.rotas[i], self.rotas[j], melhoria_realocacao = self._aplicar_realocacao_entre_rotas(self.rotas[i], self.rotas[j])
+                melhoria_realocacao = self._avaliar(self._aplicar_realocacao_entre_rotas, self.rotas[i], self.rotas[j])
                 
                 # Tentar também na direção oposta
-                self.rotas[j], self.rotas[i], melhoria_realocacao_oposta = self._aplicar_realocacao_entre_rotas(self.rotas[j], self.rotas[i])
+                melhoria_realocacao_oposta = self._avaliar(self._aplicar_realocacao_entre_rotas,
+                                                           self.rotas[j], self.rotas[i])
+                
+                # Trocar ou transferir trechos de serviços consecutivos
+                melhoria_cross = self._avaliar(self._aplicar_cross_entre_rotas, self.rotas[i], self.rotas[j])
                 
-                if melhoria_troca or melhoria_realocacao or melhoria_realocacao_oposta:
+                if melhoria_troca or melhoria_realocacao or melhoria_realocacao_oposta or melhoria_cross:
                     melhoria_global = True
         
         return melhoria_global
     
     def _recalcular_custo_total(self):
         """Recalcula o custo total da solução."""
-        self.custo_total = sum(rota['custo_total'] for rota in self.rotas)
+        self.custo_total = sum(rota.custo_total for rota in self.rotas)
     
-    def aplicar_busca_local(self, max_iteracoes=100):
-        """Aplica busca local para melhorar a solução."""
+    def atualizar_distancias(self):
+        """Refaz o que depende das distâncias depois de Grafo.alterar_custo/remover_ligacao.
+        
+        As matrizes de caminhos mínimos são as do grafo, já atualizadas no lugar; aqui só
+        os custos das rotas, as vizinhanças e as avaliações guardadas são renovados (a matriz
+        reduzida é recalculada). Retratos de solução anteriores à mudança guardam custos antigos.
+        """
+        if self.matriz_reduzida:
+            _, self.dist_numpy, self.dist_matrix, _ = self.grafo.distancias_resolvedor(self.verts)
+            self.dist = self.dist_matrix
+        if self.granularidade is not None:
+            self.vizinhos = vizinhos_mais_proximos(self.servicos, self.dist_numpy, self.granularidade)
+        self._proximos_ruina = None
+        self._sem_melhoria.clear()
+        for rota in self.rotas:
+            rota.custo_total = self._calcular_custo_rota(rota)
+            rota.alterada()
+        self._recalcular_custo_total()
+    
+    def aplicar_busca_local(self, max_iteracoes=100, prazo=None):
+        """Aplica busca local para melhorar a solução (até o instante `prazo`, se dado)."""
         iteracao = 0
         melhoria = True
         
         while melhoria and iteracao < max_iteracoes:
+            if prazo is not None and time.perf_counter_ns() >= prazo:
+                break
             melhoria_intra = self._aplicar_busca_local_intra_rota()
             melhoria_entre = self._aplicar_busca_local_entre_rotas()
             
@@ -440,18 +1008,172 @@ class SolucaoMelhorada:
             
             if melhoria:
                 self._recalcular_custo_total()
+                self._registrar_custo('busca_local')
+            
+            iteracao += 1
+    
+    def _copiar_solucao(self):
+        """Retrato leve da solução atual: serviços e custos das rotas e sentido das arestas."""
+        rotas = [(rota.servicos[:], rota.demanda_total, rota.custo_total, rota.retorna_deposito, rota.versao)
+                 for rota in self.rotas]
+        return rotas, bytes(self.invertido)
+    
+    def _restaurar_solucao(self, retrato):
+        """Volta para uma solução guardada por _copiar_solucao."""
+        rotas, invertido = retrato
+        for servico, sentido in enumerate(invertido):
+            if self.invertido[servico] != sentido:
+                self._inverter(servico)
+        self.rotas = []
+        for servicos, demanda_total, custo_total, retorna_deposito, versao in rotas:
+            rota = Rota(len(self.rotas) + 1, servicos[:])
+            rota.demanda_total = demanda_total
+            rota.custo_total = custo_total
+            rota.retorna_deposito = retorna_deposito
+            # Mesmo conteúdo do retrato: as avaliações já feitas nessa versão continuam valendo
+            rota.versao = versao
+            self.rotas.append(rota)
+        self._recalcular_custo_total()
+    
+    def _arruinar(self, aleatorio, quantidade):
+        """Remove um serviço sorteado e os seus vizinhos mais próximos; retorna os removidos."""
+        if self._proximos_ruina is None:
+            self._proximos_ruina = vizinhos_mais_proximos(self.servicos, self.dist_numpy, RUINA_MAX)
+        
+        rota_do_servico = {servico: rota for rota in self.rotas for servico in rota.servicos}
+        semente = aleatorio.choice(list(rota_do_servico))
+        removidos = [semente] + self._proximos_ruina[semente][:quantidade - 1]
+        
+        afetadas = []
+        for servico in removidos:
+            rota = rota_do_servico[servico]
+            rota.servicos.remove(servico)
+            rota.demanda_total -= self.servicos.demanda[servico]
+            afetadas.append(rota)
+        for rota in afetadas:
+            rota.custo_total = self._calcular_custo_rota(rota)
+            rota.retorna_deposito = True
+            rota.alterada()
+        self.rotas = [rota for rota in self.rotas if rota.servicos]
+        return removidos
+    
+    def _recriar(self, removidos, aleatorio):
+        """Reinsere os serviços removidos, cada um na posição mais barata que o comporta."""
+        tabela = self.servicos
+        dist = self.dist
+        deposito = self.deposito_idx
+        aleatorio.shuffle(removidos)
+        
+        for servico in removidos:
+            # Rota nova só com o serviço, nos sentidos possíveis
+            melhor = (dist[deposito][self.inicio[servico]] + dist[self.fim[servico]][deposito], None, 0, False)
+            if self.reversivel[servico]:
+                invertida = dist[deposito][self.fim[servico]] + dist[self.inicio[servico]][deposito]
+                if invertida < melhor[0]:
+                    melhor = (invertida, None, 0, True)
+            
+            for rota in self.rotas:
+                if rota.demanda_total + tabela.demanda[servico] > self.capacidade_veiculo:
+                    continue
+                for j in range(len(rota.servicos) + 1):
+                    delta, inverter = self._melhor_insercao(rota.servicos, j, servico)
+                    if delta < melhor[0]:
+                        melhor = (delta, rota, j, inverter)
             
+            delta, rota, j, inverter = melhor
+            if inverter:
+                self._inverter(servico)
+            if rota is None:
+                rota = Rota(len(self.rotas) + 1)
+                self.rotas.append(rota)
+            rota.servicos.insert(j, servico)
+            rota.demanda_total += tabela.demanda[servico]
+            rota.custo_total += delta + tabela.custo[servico]
+            rota.alterada()
+            self._conferir_custo_rota(rota)
+        
+        for id_rota, rota in enumerate(self.rotas, 1):
+            rota.id = id_rota
+    
+    def _publicar(self, incumbente, custo):
+        """Informa aos demais processos da multipartida um novo melhor custo, se for o caso."""
+        if incumbente is None:
+            return
+        with incumbente.get_lock():
+            if custo < incumbente.value:
+                incumbente.value = custo
+    
+    def _podada(self, incumbente, custo):
+        """Indica se a partida está longe demais do melhor custo de todos os processos."""
+        return incumbente is not None and custo > incumbente.value * (1 + DESVIO_PODA)
+    
+    def _busca_local_iterada(self, prazo, max_iteracoes, semente, incumbente=None):
+        """Ruína e recriação seguidas de busca local até esgotar o orçamento.
+        
+        Mantém a melhor solução encontrada e registra em tempo_melhor quando ela apareceu.
+        Com `incumbente` (multiprocessing.Value compartilhado), publica os melhores custos e
+        desiste quando a partida fica DESVIO_PODA acima do melhor global.
+        """
+        if len(self.servicos) == 0:
+            return
+        aleatorio = random.Random(semente)
+        melhor = self._copiar_solucao()
+        custo_melhor = self.custo_total
+        iteracao = 0
+        
+        while max_iteracoes is None or iteracao < max_iteracoes:
+            if prazo is not None and time.perf_counter_ns() >= prazo:
+                break
+            if self._podada(incumbente, custo_melhor):
+                break
             iteracao += 1
+            
+            anterior = self._copiar_solucao()
+            quantidade = aleatorio.randint(RUINA_MIN, RUINA_MAX)
+            removidos = self._arruinar(aleatorio, min(quantidade, len(self.servicos)))
+            self._recriar(removidos, aleatorio)
+            self._recalcular_custo_total()
+            self.aplicar_busca_local(prazo=prazo)
+            self._recalcular_custo_total()
+            self._registrar_custo('perturbacao')
+            
+            if self.custo_total < custo_melhor - EPSILON:
+                melhor = self._copiar_solucao()
+                custo_melhor = self.custo_total
+                self.tempo_melhor = time.perf_counter_ns() - self.tempo_inicio
+                self._publicar(incumbente, custo_melhor)
+                self._registrar_custo('melhor')
+            elif self.custo_total > custo_melhor * (1 + DESVIO_ACEITACAO):
+                self._restaurar_solucao(anterior)
+        
+        self._restaurar_solucao(melhor)
     
-    def resolver(self):
-        """Resolve o problema usando busca local."""
+    def resolver(self, tempo_limite=None, max_iteracoes=None, semente=0, incumbente=None):
+        """Resolve o problema usando busca local.
+        
+        Com um orçamento (tempo_limite em segundos e/ou max_iteracoes de perturbação), a busca
+        local é repetida a partir de perturbações da solução (ruína e recriação) até esgotá-lo.
+        """
         self.tempo_inicio = time.perf_counter_ns()
+        prazo = None
+        if tempo_limite is not None:
+            prazo = self.tempo_inicio + int(tempo_limite * 1e9)
         
         # Construir solução inicial
-        self.construir_solucao_inicial()
+        with self._etapa('construcao'):
+            self.construir_solucao_inicial()
+        self._registrar_custo('construcao')
         
         # Aplicar busca local
-        self.aplicar_busca_local()
+        with self._etapa('busca_local'):
+            self.aplicar_busca_local(prazo=prazo)
+        self._recalcular_custo_total()
+        self.tempo_melhor = time.perf_counter_ns() - self.tempo_inicio
+        self._publicar(incumbente, self.custo_total)
+        
+        if tempo_limite is not None or max_iteracoes is not None:
+            with self._etapa('busca_iterada'):
+                self._busca_local_iterada(prazo, max_iteracoes, semente, incumbente)
         
         self.tempo_fim = time.perf_counter_ns()
         return self.rotas
@@ -465,63 +1187,127 @@ class SolucaoMelhorada:
         saida.append(f"{self.custo_total:.2f}")
         saida.append(f"{len(self.rotas)}")
         saida.append(f"{tempo_execucao}")
-        saida.append(f"{tempo_execucao}")
+        saida.append(f"{self.tempo_melhor}")
         
         for rota in self.rotas:
-            # Formato: índice_depósito dia_roteirização id_rota demanda_total custo_total total_visitas
-            total_visitas = len(rota['visitas'])
-            linha = f"0 1 {rota['id']} {rota['demanda_total']} {rota['custo_total']:.2f} {total_visitas}"
-            
-            # Adicionar visitas
-            visitas_formatadas = []
-            
-            # Primeira visita ao depósito
-            visitas_formatadas.append("(D 0,1,1)")
-            
-            # Visitas aos serviços
-            for i, servico in enumerate(rota['servicos']):
-                de, para = servico['de'], servico['para']
-                visitas_formatadas.append(f"(S {servico['id']},{de},{para})")
-            
-            # Última visita ao depósito
-            visitas_formatadas.append("(D 0,1,1)")
-            
-            linha += " " + " ".join(visitas_formatadas)
-            saida.append(linha)
+            saida.append(formatar_rota(rota, self.servicos, self.invertido))
             
         return "\n".join(saida)
 
-def processar_arquivo(arquivo_dat, pasta_saida):
-    """Processa um arquivo .dat e salva o resultado na pasta de saída."""
+# Estado de cada processo da multipartida, preenchido uma única vez por processo
+_partida = {}
+
+def _iniciar_processo_partida(grafo, descritores, incumbente, chaves=None):
+    # As matrizes de caminhos mínimos (ou a reduzida, com `chaves`) são lidas direto da
+    # memória compartilhada
+    blocos, matrizes = memoria_compartilhada.importar(descritores)
+    if chaves is None:
+        grafo.usar_caminhos(*matrizes)
+    else:
+        grafo.usar_caminhos_reduzidos(chaves, *matrizes)
+    _partida.update(grafo=grafo, blocos=blocos, incumbente=incumbente)
+
+def _executar_partida(partida, capacidade, opcoes, tempo_limite, max_iteracoes, semente):
+    # A partida 0 usa o construtivo configurado; as demais, o tour gigante aleatorizado + Split
+    if partida > 0:
+        opcoes = dict(opcoes, construtor='split', semente_construcao=semente + partida)
+    solucao = SolucaoMelhorada(_partida['grafo'], capacidade, **opcoes)
+    solucao.resolver(tempo_limite, max_iteracoes, semente + partida, _partida['incumbente'])
+    return solucao.custo_total, solucao._copiar_solucao(), solucao.tempo_inicio + solucao.tempo_melhor
+
+def resolver_multipartida(grafo, capacidade, partidas, processos=None, tempo_limite=None, max_iteracoes=None,
+                          semente=0, instrumentacao=None, **opcoes):
+    """Executa `partidas` construções + busca local em um pool de processos e fica com a melhor.
+    
+    As matrizes de caminhos mínimos vão para memória compartilhada em vez de serem copiadas
+    para cada processo, e o melhor custo encontrado até o momento é compartilhado para a poda.
+    Retorna uma SolucaoMelhorada pronta para formatar_saida(). A `instrumentacao`, se dada,
+    mede só as etapas do processo principal; as partidas não são instrumentadas.
+    """
+    solucao = SolucaoMelhorada(grafo, capacidade, instrumentacao=instrumentacao, **opcoes)
+    solucao.tempo_inicio = time.perf_counter_ns()
+    if solucao.matriz_reduzida:
+        chaves = solucao.verts
+        blocos, descritores = memoria_compartilhada.exportar(solucao.dist_numpy)
+    else:
+        chaves = None
+        _, dist, pred = grafo.caminhos_minimos()
+        blocos, descritores = memoria_compartilhada.exportar(dist, pred)
+    # O processo principal só restaura e formata a melhor partida: as cópias das matrizes em
+    # listas dão lugar a consultas no lugar antes de criar o pool, para que os processos
+    # criados por fork não as herdem
+    solucao.dist = solucao.dist_matrix = caminhos.linhas(solucao.dist_numpy)
+    solucao.pred_matrix = None
+    grafo.descartar_listas()
+    incumbente = multiprocessing.Value('d', math.inf)
+    try:
+        with solucao._etapa('multipartida'), \
+                multiprocessing.Pool(processos, _iniciar_processo_partida,
+                                     (grafo, descritores, incumbente, chaves)) as pool:
+            resultados = pool.starmap(_executar_partida,
+                                      [(partida, capacidade, opcoes, tempo_limite, max_iteracoes, semente)
+                                       for partida in range(partidas)])
+    finally:
+        memoria_compartilhada.liberar(blocos)
+    
+    # Empates ficam com a partida de menor número
+    custo, retrato, instante_melhor = min(resultados, key=lambda resultado: resultado[0])
+    solucao._restaurar_solucao(retrato)
+    for rota in solucao.rotas:
+        rota.alterada()  # Versões numeradas em outro processo não valem neste
+    solucao.tempo_melhor = max(0, instante_melhor - solucao.tempo_inicio)
+    solucao.tempo_fim = time.perf_counter_ns()
+    return solucao
+
+def processar_arquivo(arquivo_dat, pasta_saida, pasta_cache=None, verificar_deltas=False, granularidade=None,
+                      construtor='guloso', orientar_arestas=True, orcamento=None, iteracoes=None, semente=0,
+                      partidas=1, processos=None, estrategia='melhor', pular_inalteradas=True, instrumentar=False,
+                      matriz_reduzida=False, pouca_memoria=False):
+    """Processa um arquivo .dat e salva o resultado na pasta de saída.
+    
+    Com `instrumentar`, grava também perfil-<instância>.json/.csv com tempos por etapa,
+    contagens por operador e a trajetória do custo.
+    """
     try:
+        zerar_pico_memoria()
         # Extrair o nome base do arquivo
         nome_base = os.path.basename(arquivo_dat)
+        instrumentacao = Instrumentacao() if instrumentar else None
         
         # Carregar grafo
-        g = Grafo()
-        g.ler_dat(arquivo_dat)
-        
-        # Obter capacidade do veículo do arquivo
-        capacidade = 5  # Valor padrão
-        with open(arquivo_dat, 'r') as f:
-            for linha in f:
-                if linha.startswith("Capacity:"):
-                    capacidade = int(linha.split(":")[1].strip())
-                    break
+        g = Grafo(pasta_cache, pouca_memoria)
+        with instrumentacao.etapa('leitura') if instrumentacao else nullcontext():
+            g.ler_dat(arquivo_dat)
+        
+        # Capacidade do veículo, já lida junto com a instância
+        capacidade = g.capacidade if g.capacidade is not None else 5  # Valor padrão
         
         # Construir solução
-        solucao = SolucaoMelhorada(g, capacidade)
-        solucao.resolver()
+        if partidas > 1:
+            solucao = resolver_multipartida(g, capacidade, partidas, processos, orcamento, iteracoes, semente,
+                                            verificar_deltas=verificar_deltas, granularidade=granularidade,
+                                            construtor=construtor, orientar_arestas=orientar_arestas,
+                                            estrategia=estrategia, pular_inalteradas=pular_inalteradas,
+                                            instrumentacao=instrumentacao, matriz_reduzida=matriz_reduzida)
+        else:
+            solucao = SolucaoMelhorada(g, capacidade, verificar_deltas, granularidade, construtor, orientar_arestas,
+                                       estrategia=estrategia, pular_inalteradas=pular_inalteradas,
+                                       instrumentacao=instrumentacao, matriz_reduzida=matriz_reduzida)
+            solucao.resolver(orcamento, iteracoes, semente)
         
         # Formatar saída
         resultado = solucao.formatar_saida()
         
         # Criar arquivo de saída
         arquivo_saida = os.path.join(pasta_saida, f"sol-{nome_base}")
-        with open(arquivo_saida, 'w') as f:
-            f.write(resultado)
+        gravar_atomico(arquivo_saida, resultado)
+        if instrumentacao is not None:
+            instrumentacao.gravar(pasta_saida, nome_base, instancia=nome_base, custo=solucao.custo_total,
+                                  rotas=len(solucao.rotas), servicos=len(solucao.servicos),
+                                  movimentos_avaliados=solucao.movimentos_avaliados,
+                                  pico_memoria_mb=pico_memoria())
         
-        print(f"Processado: {nome_base} -> {arquivo_saida}")
+        print(f"Processado: {nome_base} -> {arquivo_saida} (pico de memória: {pico_memoria():.1f} MB)")
         return True
     except Exception as e:
         print(f"Erro ao processar {arquivo_dat}: {str(e)}")
@@ -529,17 +1315,55 @@ def processar_arquivo(arquivo_dat, pasta_saida):
 
 def main():
     # Verificar argumentos
-    if len(sys.argv) < 2:
-        print("Uso: python solucao_etapa3.py <pasta_dados>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Busca local para o NEARP.")
+    parser.add_argument("pasta_dados", help="pasta com os arquivos .dat")
+    parser.add_argument("--cache-caminhos", metavar="PASTA", default=None,
+                        help="pasta para gravar e reaproveitar as matrizes de caminhos mínimos")
+    parser.add_argument("--verificar-deltas", action="store_true",
+                        help="depuração: confere cada delta da busca local com o recálculo completo")
+    parser.add_argument("--granularidade", type=int, default=None, metavar="K",
+                        help="operadores entre rotas só consideram os K serviços mais próximos")
+    parser.add_argument("--construtor", choices=("guloso", "split"), default="guloso",
+                        help="solução inicial: vizinho mais próximo ou tour gigante + Split")
+    parser.add_argument("--arestas-fixas", action="store_true",
+                        help="atende as arestas requeridas sempre no sentido lido do arquivo")
+    parser.add_argument("--estrategia", choices=("melhor", "primeira"), default="melhor",
+                        help="aplica o melhor movimento de cada vizinhança ou o primeiro que melhora")
+    parser.add_argument("--varredura-completa", action="store_true",
+                        help="reavalia todas as rotas a cada passada, mesmo as que não mudaram")
+    parser.add_argument("--instrumentar", action="store_true",
+                        help="grava perfil-*.json/.csv com tempos, contagens por operador e trajetória do custo")
+    parser.add_argument("--matriz-reduzida", action="store_true",
+                        help="distâncias só entre depósito e extremidades dos serviços (menos memória)")
+    parser.add_argument("--pouca-memoria", action="store_true",
+                        help="distâncias em float32, sem cópias em listas e mapeadas do disco com --cache-caminhos")
+    parser.add_argument("--orcamento", type=float, default=None, metavar="SEGUNDOS",
+                        help="tempo por instância para a busca local iterada (ruína e recriação)")
+    parser.add_argument("--iteracoes", type=int, default=None, metavar="N",
+                        help="número máximo de perturbações da busca local iterada")
+    parser.add_argument("--semente", type=int, default=0,
+                        help="semente do gerador aleatório da busca local iterada")
+    parser.add_argument("--partidas", type=int, default=1, metavar="N",
+                        help="multipartida: N construções aleatorizadas + busca local por instância")
+    parser.add_argument("--processos", type=int, default=None, metavar="P",
+                        help="processos usados pela multipartida (padrão: número de CPUs)")
+    parser.add_argument("--workers", "--trabalhadores", type=int, default=1, metavar="N",
+                        help="número de processos para rodar instâncias em paralelo")
+    parser.add_argument("--tempo-limite", type=float, default=None, metavar="SEGUNDOS",
+                        help="tempo máximo por instância; ao estourar, a instância conta como falha")
+    args = parser.parse_args()
     
-    pasta_dados = sys.argv[1]
+    pasta_dados = args.pasta_dados
     
     # Verificar se a pasta existe
     if not os.path.isdir(pasta_dados):
         print(f"Erro: A pasta {pasta_dados} não existe.")
         sys.exit(1)
     
+    if args.workers < 1:
+        print(f"Erro: --workers deve ser pelo menos 1 (recebido {args.workers}).")
+        sys.exit(1)
+    
     # Criar pasta de saída G3Result se não existir
     pasta_saida = "G3Result"
     if not os.path.exists(pasta_saida):
@@ -555,15 +1379,13 @@ def main():
     
     print(f"Encontrados {len(arquivos_dat)} arquivos .dat para processar.")
     
-    # Processar cada arquivo
-    sucessos = 0
-    falhas = 0
-    
-    for arquivo in arquivos_dat:
-        if processar_arquivo(arquivo, pasta_saida):
-            sucessos += 1
-        else:
-            falhas += 1
+    # Processar cada arquivo (as maiores instâncias primeiro)
+    sucessos, falhas = executar_lote(arquivos_dat, processar_arquivo, pasta_saida,
+                                     (args.cache_caminhos, args.verificar_deltas, args.granularidade, args.construtor,
+                                      not args.arestas_fixas, args.orcamento, args.iteracoes, args.semente,
+                                      args.partidas, args.processos, args.estrategia, not args.varredura_completa,
+                                      args.instrumentar, args.matriz_reduzida, args.pouca_memoria),
+                                     args.workers, args.tempo_limite)
     
     print(f"\nProcessamento concluído: {sucessos} arquivos processados com sucesso, {falhas} falhas.")
 